@@ -0,0 +1,301 @@
+'''
+    Precomputed aggregate store shared across gunicorn workers.
+
+    The derived tables from preprocess.py are written once per dataset
+    version as .npy columns plus a small categorical dictionary (see
+    dataset.write_columns). Workers map the columns read-only, so the OS page
+    cache holds a single physical copy no matter how many workers run.
+
+    Build the store ahead of time with:
+
+        python aggregate_store.py [--out-of-core] [path/to.csv]
+'''
+import json
+import os
+import shutil
+
+import dataset
+import preprocess
+import streaming
+from popularity_index import sort_frame
+
+# Bump when a table definition in preprocess.py changes so existing stores
+# are rebuilt instead of being served stale.
+STORE_VERSION = 12
+
+# Tables the app serves from; 'track_ids' is only needed for ingestion.
+SERVING_TABLES = [
+    'bar_df', 'line_chart_df', 'stacked_df', 'radar_df', 'scatter_df', 'violin_df', 'hierarchy_df',
+    'tracks_df', 'violin_counts'
+]
+
+
+def build_tables(raw_df):
+    """
+    Computes every derived table used by the app.
+
+    Args:
+        raw_df (pd.DataFrame): Raw Spotify data.
+
+    Returns:
+        dict: Table name to dataframe.
+    """
+    return {
+        'bar_df': preprocess.bar_chart_df(raw_df),
+        'line_chart_df': preprocess.line_chart_df(raw_df),
+        'stacked_df': preprocess.area_chart_df(raw_df),
+        'radar_df': preprocess.radar_chart_df(raw_df),
+        'scatter_df': sort_frame(preprocess.scatter_chart_df(raw_df, sample_size=None)),
+        'violin_df': preprocess.violin_plots_df(raw_df),
+        'violin_counts': preprocess.violin_counts_df(raw_df),
+        'hierarchy_df': preprocess.hierarchy_df(raw_df),
+        'tracks_df': preprocess.tracks_df(raw_df),
+        'track_ids': raw_df[['track_id']].drop_duplicates(),
+    }
+
+
+def compute_tables(csv_path, cache_dir=dataset.CACHE_DIR, out_of_core=None):
+    """
+    Computes every derived table from the CSV, streaming it when it is large.
+
+    Args:
+        csv_path (str): Path to spotify_songs.csv.
+        cache_dir (str): Directory holding the caches.
+        out_of_core (bool): Force (True) or forbid (False) the single-pass
+            streaming mode; None picks it for CSVs larger than
+            streaming.STREAM_THRESHOLD bytes.
+
+    Returns:
+        dict: Table name to dataframe.
+    """
+    if out_of_core is None:
+        out_of_core = os.path.getsize(csv_path) > streaming.STREAM_THRESHOLD
+    if out_of_core:
+        return streaming.build_tables(csv_path)
+    return build_tables(dataset.load_dataset(csv_path, cache_dir))
+
+
+def store_path(csv_path, cache_dir=dataset.CACHE_DIR):
+    """
+    Returns the store directory for the current version of the CSV.
+
+    Args:
+        csv_path (str): Path to spotify_songs.csv.
+        cache_dir (str): Directory holding the caches.
+
+    Returns:
+        str: Path of the aggregate store directory.
+    """
+    return os.path.join(cache_dir, f'aggregates-v{STORE_VERSION}-{dataset.cache_key(csv_path)}')
+
+
+def write_store(tables, path):
+    """
+    Atomically writes the tables to a store directory.
+
+    Args:
+        tables (dict): Table name to dataframe.
+        path (str): Store directory.
+    """
+    def write(tmp_path):
+        for name, df in tables.items():
+            dataset.write_columns(df.reset_index(drop=True), os.path.join(tmp_path, name))
+
+    dataset.publish_directory(path, write)
+
+
+def open_store(path, names=None):
+    """
+    Maps the tables of a store read-only.
+
+    String columns stay categorical, so every column is a mapped array and
+    no table holds a per-row Python object. Worker processes forked from a
+    preloading master can then read the tables without refcount updates
+    dirtying shared pages.
+
+    Args:
+        path (str): Store directory.
+        names (list): Tables to open, or None for all of them.
+
+    Returns:
+        dict: Table name to dataframe backed by memory-mapped columns.
+    """
+    return {
+        name: dataset.read_columns(os.path.join(path, name), mmap_mode='r', decode_strings=False)
+        for name in (names or sorted(os.listdir(path)))
+    }
+
+
+def pointer_path(base_path):
+    """
+    Returns the file naming the current revision of a store.
+
+    Incremental ingestion publishes new revisions of a base store; the
+    pointer file is replaced atomically so readers switch in one step.
+
+    Args:
+        base_path (str): Base store directory, see store_path.
+
+    Returns:
+        str: Path of the pointer file.
+    """
+    return base_path + '.current'
+
+
+def read_pointer(base_path):
+    """
+    Reads the current revision of a store.
+
+    Args:
+        base_path (str): Base store directory.
+
+    Returns:
+        dict: 'path' (revision directory name) and 'deltas' (names of the
+        delta files already applied, in order).
+    """
+    try:
+        with open(pointer_path(base_path), encoding='utf-8') as pointer_file:
+            return json.load(pointer_file)
+    except FileNotFoundError:
+        return {'path': os.path.basename(base_path), 'deltas': []}
+
+
+def write_pointer(base_path, name, deltas):
+    """
+    Atomically points readers of a store at a revision.
+
+    Args:
+        base_path (str): Base store directory.
+        name (str): Revision directory name.
+        deltas (list): Names of the delta files applied so far.
+    """
+    pointer = pointer_path(base_path)
+    tmp_pointer = f'{pointer}.{os.getpid()}.tmp'
+    with open(tmp_pointer, 'w', encoding='utf-8') as pointer_file:
+        json.dump({'path': name, 'deltas': list(deltas)}, pointer_file)
+    os.replace(tmp_pointer, pointer)
+
+
+def publish_revision(base_path, tables, deltas):
+    """
+    Writes a new revision of a store and points readers at it.
+
+    Args:
+        base_path (str): Base store directory.
+        tables (dict): Every table of the new revision.
+        deltas (list): Names of the delta files applied so far.
+
+    Returns:
+        str: Path of the new revision directory.
+    """
+    name = f'{os.path.basename(base_path)}-r{len(deltas)}'
+    path = os.path.join(os.path.dirname(base_path), name)
+    write_store(tables, path)
+    write_pointer(base_path, name, deltas)
+
+    # Older revisions stay readable for workers that still map them: on
+    # POSIX, unlinked files live on until they are unmapped.
+    dataset.prune(os.path.dirname(base_path), f'{os.path.basename(base_path)}-r', path)
+    return path
+
+
+def current_revision(csv_path, cache_dir=dataset.CACHE_DIR):
+    """
+    Returns the name of the current revision without building anything.
+
+    Args:
+        csv_path (str): Path to spotify_songs.csv.
+        cache_dir (str): Directory holding the caches.
+
+    Returns:
+        str: Revision directory name.
+    """
+    return read_pointer(store_path(csv_path, cache_dir))['path']
+
+
+def current_store(csv_path, cache_dir=dataset.CACHE_DIR):
+    """
+    Returns the directory of the current store revision, building the base if needed.
+
+    Args:
+        csv_path (str): Path to spotify_songs.csv.
+        cache_dir (str): Directory holding the caches.
+
+    Returns:
+        str: Path of the current revision directory.
+    """
+    base_path = build_store(csv_path, cache_dir)
+    return os.path.join(cache_dir, read_pointer(base_path)['path'])
+
+
+def _prune_bases(cache_dir, base):
+    """Removes stores, revisions and pointers that do not belong to base."""
+    for name in os.listdir(cache_dir):
+        if not name.startswith('aggregates-') or name == base or name.startswith(f'{base}-r') \
+                or name == os.path.basename(pointer_path(base)):
+            continue
+        stale = os.path.join(cache_dir, name)
+        if os.path.isdir(stale):
+            shutil.rmtree(stale, ignore_errors=True)
+        else:
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                pass
+
+
+def build_store(csv_path, cache_dir=dataset.CACHE_DIR, out_of_core=None):
+    """
+    Builds the store for the current CSV if it does not exist yet.
+
+    Args:
+        csv_path (str): Path to spotify_songs.csv.
+        cache_dir (str): Directory holding the caches.
+        out_of_core (bool): See compute_tables. Only applies to a fresh
+            build: an existing store is returned as is.
+
+    Returns:
+        str: Path of the aggregate store directory.
+    """
+    path = store_path(csv_path, cache_dir)
+    if not os.path.exists(path):
+        write_store(compute_tables(csv_path, cache_dir, out_of_core), path)
+        _prune_bases(cache_dir, os.path.basename(path))
+    return path
+
+
+def load_tables(csv_path, cache_dir=dataset.CACHE_DIR, names=None):
+    """
+    Returns the derived tables of the current revision, mapped from the store when possible.
+
+    Falls back to computing them in memory if the cache directory is not
+    writable.
+
+    Args:
+        csv_path (str): Path to spotify_songs.csv.
+        cache_dir (str): Directory holding the caches.
+        names (list): Tables to load, SERVING_TABLES by default.
+
+    Returns:
+        dict: Table name to dataframe.
+    """
+    names = SERVING_TABLES if names is None else names
+    try:
+        return open_store(current_store(csv_path, cache_dir), names)
+    except OSError:
+        tables = compute_tables(csv_path, cache_dir)
+        return {name: tables[name] for name in names}
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description='Builds the aggregate store of a CSV.')
+    parser.add_argument('csv_path', nargs='?', default='./assets/spotify_songs.csv', help='Path to the CSV.')
+    parser.add_argument('--out-of-core', action='store_true',
+                        help='Aggregate in one bounded-memory pass (streaming.py) whatever the size. '
+                             'Only applies when the store does not exist yet.')
+    args = parser.parse_args()
+    if args.out_of_core and os.path.exists(store_path(args.csv_path)):
+        sys.exit(f'{store_path(args.csv_path)} already exists; remove it to rebuild out of core.')
+    print(build_store(args.csv_path, out_of_core=True if args.out_of_core else None))
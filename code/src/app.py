@@ -1,28 +1,315 @@
+import hmac
+import importlib
+import os
+import tempfile
+import threading
+import time
+
 import dash
 import dash_bootstrap_components as dbc
-from dash import html, dcc, Input, Output
-import pandas as pd
-
-import preprocess
-import bar_chart
-import radar_chart
-import line_chart
-import area_chart
-import scatter_chart
-import violin_plots
-from constaints import GENRE_COLORS 
+from dash import html, dcc, Input, Output, State, ClientsideFunction
+from flask import request, abort, g, Response
+from werkzeug.utils import secure_filename
+import aggregate_store
+import cross_filter
+import figure_cache
+import figure_warmer
+import ingest
+import metrics
+import static_figures
+
+# Chart modules (and plotly.express with them) are imported on first use by
+# the page that needs them, see PAGES.
 
 # --- Load and preprocess data ---
-raw_df = pd.read_csv('./assets/spotify_songs.csv')
-bar_df = preprocess.bar_chart_df(raw_df)
-line_chart_df = preprocess.line_chart_df(raw_df)
-stacked_df = preprocess.area_chart_df(raw_df)
-radar_df = preprocess.radar_chart_df(raw_df)
-scatter_df = preprocess.scatter_chart_df(raw_df)
-violin_df = preprocess.violin_plots_df(raw_df)
+DATA_PATH = './assets/spotify_songs.csv'
+
+# 'summary' ships precomputed densities; 'raw' ships every popularity value.
+VIOLIN_MODE = os.environ.get('DATAVIZ_VIOLIN_MODE', 'summary')
+
+# Scatter selections larger than this are drawn as a density view.
+SCATTER_POINT_LIMIT = int(os.environ.get('DATAVIZ_SCATTER_POINT_LIMIT', 10000))
+
+# Number of similar tracks listed for a clicked scatter point.
+SIMILAR_TRACKS = int(os.environ.get('DATAVIZ_SIMILAR_TRACKS', 10))
+
+# Initial popularity range of the scatter page's slider.
+SCATTER_DEFAULT_RANGE = [20, 80]
+
+# When enabled, the line, stacked and radar pages receive every genre once
+# and assets/genre_filter.js toggles trace visibility in the browser.
+CLIENTSIDE_FILTERS = os.environ.get('DATAVIZ_CLIENTSIDE_FILTERS', '1') == '1'
+
+# Seconds between checks for a new store revision published by ingestion.
+RELOAD_INTERVAL = float(os.environ.get('DATAVIZ_RELOAD_INTERVAL', 1.0))
+
+# Shared secret for POST /ingest; the route is disabled when unset.
+INGEST_TOKEN = os.environ.get('DATAVIZ_INGEST_TOKEN')
+
+# When enabled, every page is warmed in a background thread after startup;
+# otherwise each page loads on its first request.
+WARM_PAGES = os.environ.get('DATAVIZ_WARM_PAGES', '1') == '1'
+
+# Set by gunicorn.conf.py: the master warms every page itself before forking
+# the workers, so no warm-up thread is started at import.
+PRELOAD = os.environ.get('DATAVIZ_PRELOAD') == '1'
+
+
+class _lazy:
+    """Snapshot attribute computed once, on first access."""
+
+    def __init__(self, build):
+        self.build = build
+        self.name = build.__name__
+
+    def __get__(self, snapshot, owner):
+        if snapshot is None:
+            return self
+        with snapshot._lock:
+            if self.name not in snapshot.__dict__:
+                snapshot.__dict__[self.name] = self.build(snapshot)
+        return snapshot.__dict__[self.name]
+
+
+class Snapshot:
+    '''
+        Tables and indexes of one store revision. Each is loaded on first
+        access, so startup does no data work and a page only pays for the
+        tables it shows. Callbacks read every table from one snapshot, so
+        swapping the module-level `data` switches them to a new revision
+        atomically.
+    '''
+
+    def __init__(self):
+        self._lock = threading.RLock()
+
+    @property
+    def loaded(self):
+        '''Whether the store revision has been pinned yet.'''
+        return 'store' in self.__dict__
+
+    @_lazy
+    def store(self):
+        '''Replays pending deltas and pins the current store revision.'''
+        try:
+            ingest.replay(DATA_PATH)
+            return aggregate_store.current_store(DATA_PATH)
+        except OSError:
+            return None
+
+    @property
+    def revision(self):
+        return os.path.basename(self.store) if self.store else None
+
+    @_lazy
+    def fallback_tables(self):
+        '''Every table computed in memory, when the cache is not writable.'''
+        return aggregate_store.compute_tables(DATA_PATH)
+
+    def table(self, name):
+        if self.store is None:
+            return self.fallback_tables[name]
+        try:
+            return aggregate_store.open_store(self.store, [name])[name]
+        except OSError:
+            # The pinned revision was pruned; refresh_data swaps to the new one.
+            return aggregate_store.load_tables(DATA_PATH, names=[name])[name]
+
+    @_lazy
+    def bar_df(self):
+        return self.table('bar_df')
+
+    @_lazy
+    def line_chart_df(self):
+        return self.table('line_chart_df')
+
+    @_lazy
+    def stacked_df(self):
+        return self.table('stacked_df')
+
+    @_lazy
+    def radar_df(self):
+        return self.table('radar_df')
+
+    @_lazy
+    def scatter_df(self):
+        return self.table('scatter_df')
+
+    @_lazy
+    def violin_df(self):
+        return self.table('violin_df')
+
+    @_lazy
+    def violin_counts(self):
+        return self.table('violin_counts')
+
+    @_lazy
+    def tracks_df(self):
+        return self.table('tracks_df')
+
+    @_lazy
+    def bitmap_index(self):
+        from bitmap_index import BitmapIndex
+        return BitmapIndex(self.tracks_df)
+
+    @_lazy
+    def cross_filter(self):
+        return cross_filter.CrossFilter(self.tracks_df, self.bitmap_index)
+
+    @_lazy
+    def scatter_index(self):
+        from popularity_index import PopularityIndex
+        return PopularityIndex(self.scatter_df)
+
+    @_lazy
+    def similarity(self):
+        from similarity import SimilarityIndex
+        return SimilarityIndex(self.scatter_df)
+
+    @_lazy
+    def line_cube(self):
+        import preprocess
+        return preprocess.line_chart_cube(self.line_chart_df)
+
+    @_lazy
+    def stacked_pyramid(self):
+        import preprocess
+        return preprocess.stacked_pyramid(self.stacked_df)
+
+    @_lazy
+    def hierarchy(self):
+        from hierarchy_cube import HierarchyCube
+        return HierarchyCube.from_moments(self.table('hierarchy_df'))
+
+
+# Page path -> (chart module, snapshot attributes, static figures) it needs.
+PAGES = {
+    '/line-chart': ('line_chart', ['line_cube'], []),
+    '/stacked': ('area_chart', ['stacked_pyramid'], ['stacked']),
+    '/radar': ('radar_chart', ['radar_df', 'hierarchy'], ['radar']),
+    '/scatter': ('scatter_chart', ['scatter_df', 'scatter_index', 'similarity'], []),
+    '/violin': ('violin_plots', ['violin_counts' if VIOLIN_MODE == 'summary' else 'violin_df', 'cross_filter'], ['violin']),
+    '/bar': ('bar_chart', ['bar_df', 'hierarchy', 'cross_filter'], ['bar']),
+}
+
+# Current Snapshot, replaced by load_data().
+data = None
+
+_warm_pages = set()
+
+
+def chart(name):
+    '''
+        Returns a chart module, importing it on first use.
+    '''
+    return importlib.import_module(name)
+
+
+def warm_page(pathname):
+    '''
+        Loads the chart module, data and static figures of a page.
+        Cheap once the page is warm.
+    '''
+    if pathname in _warm_pages or pathname not in PAGES:
+        return
+    snapshot = data
+    module, attributes, figures = PAGES[pathname]
+    chart(module)
+    for attribute in attributes:
+        getattr(snapshot, attribute)
+    for name in figures:
+        static_figures.get(name)
+    if snapshot is data:
+        _warm_pages.add(pathname)
+
+
+def warm_plan():
+    '''
+        Lists the cached figures of every input combination of the
+        interactive pages, as (cached callback name, args) pairs. Genre
+        selections closest to the default of all genres come first.
+    '''
+    plan = [('bar_drilldown', (genre,)) for genre in all_genres]
+    if CLIENTSIDE_FILTERS:
+        plan += [('update_temporal_figure', (feature,)) for feature in all_features]
+        plan += [('radar_drilldown', (genre,)) for genre in all_genres]
+    for genres in figure_warmer.genre_subsets(all_genres):
+        if not CLIENTSIDE_FILTERS:
+            plan += [('update_temporal', (feature, genres)) for feature in all_features]
+            plan += [('update_stacked', (genres, None)), ('update_radar', (genres, 'all'))]
+        plan.append(('update_scatter', (genres, SCATTER_DEFAULT_RANGE, None)))
+    return plan
+
+
+def warm_all():
+    '''
+        Warms every page in PAGES order, then the figure cache; run in a
+        background thread.
+    '''
+    start = time.monotonic()
+    for pathname in PAGES:
+        try:
+            warm_page(pathname)
+        except Exception:
+            app.logger.exception('Warming %s failed', pathname)
+    app.logger.info('Pages warmed in %.1fs', time.monotonic() - start)
+    figure_warmer.warm(warm_plan(), app.logger)
+
+
+def load_data(warm=WARM_PAGES):
+    '''
+        Replaces the data snapshot with a fresh lazy one and drops every
+        figure built from the previous one. Starts warming the pages in a
+        background thread when warm is set.
+    '''
+    global data
+    data = Snapshot()
+    _warm_pages.clear()
+    static_figures.invalidate()
+    figure_cache.cache.clear()
+    if warm:
+        threading.Thread(target=warm_all, name='page-warmer', daemon=True).start()
+
+
+_reload_lock = threading.Lock()
+_last_reload_check = time.monotonic()
+
+
+def refresh_data(force=False):
+    '''
+        Switches to a newer store revision if ingestion published one.
+        Checks at most once every RELOAD_INTERVAL seconds unless forced.
+    '''
+    global _last_reload_check
+    now = time.monotonic()
+    if not data.loaded or (not force and now - _last_reload_check < RELOAD_INTERVAL):
+        return
+    _last_reload_check = now
+    if aggregate_store.current_revision(DATA_PATH) == data.revision:
+        return
+    with _reload_lock:
+        if aggregate_store.current_revision(DATA_PATH) != data.revision:
+            load_data()
+
+
+static_figures.register('bar', lambda: chart('bar_chart').get_figure(data.bar_df))
+def violin_figure():
+    '''
+        Draws summary violins from the exact popularity counts, which
+        streamed stores keep even though their violin_df is a sample.
+    '''
+    if VIOLIN_MODE == 'summary':
+        return chart('violin_plots').get_counts_figure(data.violin_counts)
+    return chart('violin_plots').get_figure(data.violin_df, mode=VIOLIN_MODE)
+
+
+static_figures.register('violin', violin_figure)
+static_figures.register('stacked', lambda: chart('area_chart').get_pyramid_figure(data.stacked_pyramid))
+static_figures.register('radar', lambda: chart('radar_chart').get_figure(data.radar_df))
 
 all_features = ['track_popularity', 'danceability', 'energy', 'valence', 'acousticness', 'speechiness']
 all_genres = ['pop', 'rap', 'rock', 'r&b', 'latin', 'edm']
+drill_options = [{'label': 'All genres', 'value': 'all'}] + [{'label': g.title(), 'value': g} for g in all_genres]
 
 CONTENT_STYLE = {
     "margin-left": "20rem",
@@ -59,7 +346,10 @@ sidebar = html.Div([
     ], vertical=True, pills=True)
 ], style=SIDEBAR_STYLE)
 
-content = html.Div(id="page-content", style=CONTENT_STYLE)
+content = html.Div([
+    html.Div(id="cross-filter-status", style={'color': '#535353', 'fontSize': '16px'}),
+    html.Div(id="page-content"),
+], style=CONTENT_STYLE)
 
 external_stylesheets = [
     dbc.themes.BOOTSTRAP,
@@ -72,6 +362,9 @@ app.title = "Exploration of Music Trends on Spotify"
 
 app.layout = html.Div([
     dcc.Location(id="url"),
+    # Linked selections of the bar and scatter charts, see cross_filter.py.
+    dcc.Store(id="cross-filter-categories"),
+    dcc.Store(id="cross-filter-region"),
     sidebar,
     content
 ])
@@ -79,7 +372,9 @@ app.layout = html.Div([
 
 # --- Layout rendering based on page ---
 @app.callback(Output("page-content", "children"), [Input("url", "pathname")])
+@metrics.instrumented('render_page_content')
 def render_page_content(pathname):
+    warm_page(pathname)
     if pathname == "/":
         return html.Div([
             html.H1(" Project Overview", style={"color": "#040E08", "fontSize": "36px", "marginBottom": "20px"}),
@@ -154,15 +449,24 @@ def render_page_content(pathname):
                     style={'width': '350px', 'display': 'inline-block'}
                 ),
             ], style={'marginBottom': '1em'}),
+            dcc.Store(id='temporal-figure'),
             dcc.Graph(id='temporal-graph', config={'displayModeBar': False}),
         ])
     elif pathname == "/bar":
         return html.Div(className='graph-section', children=[
             html.H1("Average Track Popularity by Playlist Genre", style={"color": "#1DB954"}),
             html.P("This bar chart compares the average popularity of songs across different playlist genres such as pop, hip hop, EDM, rock, and others. Each bar represents the mean popularity score for a genre, highlighting which types of playlists tend to include more widely streamed songs. Pop and hip hop lead with higher average popularity, while genres like folk or metal show lower averages, reflecting more niche audiences. Interactive hover tooltips display exact popularity values, and filters allow focusing on specific genres or subgenres for deeper comparisons.", style={'margin': '20px 40px', 'font-size': '18px'}),
+            html.Label("Drill into genre:", style={'fontWeight': 'bold', 'marginRight': '1em'}),
+            dcc.Dropdown(
+                id='bar-drill-dropdown',
+                options=drill_options,
+                value='all',
+                clearable=False,
+                style={'width': '250px', 'marginBottom': '1em'}
+            ),
             dcc.Graph(
                 id='bar-graph',
-                figure=bar_chart.get_figure(bar_df),
+                figure=static_figures.get('bar'),
                 config={'displayModeBar': False}
             ),
         ])
@@ -170,7 +474,7 @@ def render_page_content(pathname):
         return html.Div([
             html.H1("Genre Distribution Over Time", style={"color": "#1DB954"}),
             html.P("This visualization uses a stacked area chart to show the number of songs released over time, sorted by genre. Each colored zone reflects a distinct genre (e.g., Rock, Rap, Pop, etc.), allowing users to observe the evolution of each genre's contribution. Stacked area charts highlight both the total number of song releases and the shifting prominence of genres across decades. This format allows for clear comparisons of how various musical styles have changed, emerged, or declined over time. Interactive filters enable users to focus on specific genres and examine precise release counts.", style={'margin': '20px 40px', 'font-size': '18px'}),
-            html.P("Filter genre to see how genre representation changes over the years.", style={"color": "#535353", "marginTop": "1em"}),
+            html.P("Filter genre to see how genre representation changes over the years. Windows wider than 40 years show yearly averages per decade; zoom in for single years.", style={"color": "#535353", "marginTop": "1em"}),
             html.Label("Filter genres:", style={'fontWeight': 'bold', 'marginRight': '1em'}),
             dcc.Dropdown(
                 id='stacked-genre-dropdown',
@@ -179,6 +483,7 @@ def render_page_content(pathname):
                 multi=True,
                 style={'width': '400px', 'marginBottom': '1em'}
             ),
+            dcc.Store(id='stacked-figure', data=static_figures.get('stacked') if CLIENTSIDE_FILTERS else None),
             dcc.Graph(id='stacked-graph', config={'displayModeBar': False})
         ])
     elif pathname == "/radar":
@@ -194,6 +499,15 @@ def render_page_content(pathname):
                 multi=True,
                 style={'width': '400px', 'marginBottom': '1em'}
             ),
+            html.Label("Drill into genre:", style={'fontWeight': 'bold', 'marginRight': '1em'}),
+            dcc.Dropdown(
+                id='radar-drill-dropdown',
+                options=drill_options,
+                value='all',
+                clearable=False,
+                style={'width': '250px', 'marginBottom': '1em'}
+            ),
+            dcc.Store(id='radar-figure'),
             dcc.Graph(id='radar-chart', config={'displayModeBar': False}),
         ])
     
@@ -226,7 +540,7 @@ The Song Popularity range is between 0 and 100, where higher values indicate gre
             min=0,
             max=100,
             step=1,
-            value=[20, 80],
+            value=SCATTER_DEFAULT_RANGE,
             marks={i: str(i) for i in range(0, 101, 20)},
             tooltip={"placement": "bottom", "always_visible": True},
             allowCross=False,
@@ -237,6 +551,8 @@ The Song Popularity range is between 0 and 100, where higher values indicate gre
             id='scatter-chart',
             config={'displayModeBar': False}
         ),
+        html.Div(id='scatter-hover-details', style={'margin': '10px 40px', 'fontSize': '16px', 'minHeight': '1.5em'}),
+        html.Div(id='scatter-similar-tracks', style={'margin': '10px 40px', 'fontSize': '16px'}),
     ])
 
 
@@ -245,7 +561,7 @@ The Song Popularity range is between 0 and 100, where higher values indicate gre
             html.H1("Popularity Distribution by Audio Features", style={"color": "#1DB954"}),
             html.P("This grid of violin plots examines how song popularity varies across key audio features: danceability, acousticness, instrumentalness, mode, duration, and tempo. Each violin shows the full distribution of popularity scores for different bins of the feature. The plots reveal, for example, that highly danceable songs tend to concentrate in higher popularity ranges, while instrumental tracks are much less likely to achieve high popularity. Mode (major/minor) has minimal impact, while shorter durations and medium-fast tempos often correlate with better popularity. Interactive hovers, bin toggles, and zooming allow users to explore density shifts across these dimensions.", style={'margin': '20px 40px', 'font-size': '18px'}),
             html.P("These violin plots show how track popularity is distributed across different audio feature categories.", style={"color": "#535353", "marginTop": "1em"}),
-            dcc.Graph(id='violin-graph', figure=violin_plots.get_figure(violin_df), config={'displayModeBar': False}),
+            dcc.Graph(id='violin-graph', figure=static_figures.get('violin'), config={'displayModeBar': False}),
         ])
     return html.Div([
         html.H1("404: Not found", className="text-danger"),
@@ -259,43 +575,360 @@ The Song Popularity range is between 0 and 100, where higher values indicate gre
 
 
 # --- Callbacks ---
+@figure_cache.cached('radar_drilldown')
+def radar_drilldown_figure(genre):
+    with metrics.phase('filter'):
+        subgenres = data.hierarchy.breakdown(genre)
+    return chart('radar_chart').get_figure(subgenres, parent_genre=genre)
+
+
 @app.callback(
-    Output('temporal-graph', 'figure'),
-    [Input('feature-dropdown', 'value'), Input('genre-dropdown', 'value')]
+    Output('bar-graph', 'figure'),
+    [Input('bar-drill-dropdown', 'value'), Input('cross-filter-region', 'data')],
+    State('cross-filter-categories', 'data')
 )
-def update_temporal(feature, genres):
-    filtered = line_chart_df[line_chart_df['playlist_genre'].isin(genres)]
-    return line_chart.get_figure(filtered, feature)
+@metrics.instrumented('update_bar')
+def update_bar(drill_genre, region, categories):
+    '''
+        Draws the bars of the tracks in the scatter region, if any, and
+        marks the bars of the stored bar selection as selected.
+    '''
+    if region:
+        figure = linked_bar_figure(drill_genre, region)
+    elif drill_genre == 'all':
+        figure = static_figures.get('bar')
+    else:
+        figure = bar_drilldown_figure(drill_genre)
+    selected = cross_filter.category_filter(categories)
+    if selected is None or selected[0] != ('playlist_genre' if drill_genre == 'all' else 'playlist_subgenre'):
+        return figure
+    return dict(figure, data=[
+        dict(trace, selectedpoints=[0] if trace.get('name') in selected[1] else [])
+        for trace in figure['data']
+    ])
+
+
+@figure_cache.cached('bar_drilldown')
+def bar_drilldown_figure(genre):
+    with metrics.phase('filter'):
+        subgenres = data.hierarchy.breakdown(genre)[['Genre', 'track_popularity']]
+        subgenres = subgenres.rename(columns={'track_popularity': 'Average Popularity'})
+    return chart('bar_chart').get_drilldown_figure(subgenres.sort_values(by='Average Popularity', ascending=False), genre)
+
+
+@figure_cache.cached('linked_bar')
+def linked_bar_figure(drill_genre, region):
+    snapshot = data
+    with metrics.phase('filter'):
+        if drill_genre == 'all':
+            rows = snapshot.cross_filter.rows(region=region)
+            means = snapshot.cross_filter.means('playlist_genre', rows)
+        else:
+            rows = snapshot.cross_filter.rows(region=region, filters={'playlist_genre': [drill_genre]})
+            means = snapshot.cross_filter.means('playlist_subgenre', rows)
+    if drill_genre == 'all':
+        return chart('bar_chart').get_figure(means)
+    return chart('bar_chart').get_drilldown_figure(means, drill_genre)
+
 
 @app.callback(
-    Output('stacked-graph', 'figure'),
-    Input('stacked-genre-dropdown', 'value')
+    Output('violin-graph', 'figure'),
+    [Input('cross-filter-categories', 'data'), Input('cross-filter-region', 'data')]
+)
+@metrics.instrumented('update_violin')
+def update_violin(categories, region):
+    if cross_filter.category_filter(categories) is None and not region:
+        return static_figures.get('violin')
+    return linked_violin_figure(categories, region)
+
+
+@figure_cache.cached('linked_violin')
+def linked_violin_figure(categories, region):
+    snapshot = data
+    with metrics.phase('filter'):
+        tracks = snapshot.tracks_df.take(snapshot.cross_filter.rows(categories, region))
+    return chart('violin_plots').get_figure(tracks, mode=VIOLIN_MODE)
+
+
+app.clientside_callback(
+    ClientsideFunction(namespace='cross_filter', function_name='categories'),
+    Output('cross-filter-categories', 'data'),
+    [Input('bar-graph', 'selectedData'), Input('bar-drill-dropdown', 'value')],
+    prevent_initial_call=True
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace='cross_filter', function_name='region'),
+    Output('cross-filter-region', 'data'),
+    Input('scatter-chart', 'selectedData'),
+    prevent_initial_call=True
 )
-def update_stacked(selected_genres):
-    return area_chart.get_figure(stacked_df, selected_genres)
+
 
 @app.callback(
-    Output('radar-chart', 'figure'),
-    Input('radar-genre-dropdown', 'value')
+    Output('cross-filter-status', 'children'),
+    [Input('cross-filter-categories', 'data'), Input('cross-filter-region', 'data')]
 )
-def update_radar(selected_genres):
-    filtered_radar_df = radar_df[radar_df['Genre'].isin(selected_genres)]
-    return radar_chart.get_figure(filtered_radar_df)
+def describe_cross_filter(categories, region):
+    '''
+        Names the linked selections the Bar, Scatter and Violin pages are
+        filtered by, and how to clear them.
+    '''
+    parts = []
+    selected = cross_filter.category_filter(categories)
+    if selected is not None:
+        level = 'genres' if selected[0] == 'playlist_genre' else 'subgenres'
+        parts.append(f"{level} {', '.join(selected[1])} (click a selected bar again to clear)")
+    if region:
+        parts.append("an energy/valence region (double-click the scatter plot to clear)")
+    if not parts:
+        return None
+    return [html.B("Linked selection: "), "; ".join(parts) + "."]
+
+
+if CLIENTSIDE_FILTERS:
+    @app.callback(
+        Output('temporal-figure', 'data'),
+        Input('feature-dropdown', 'value')
+    )
+    @metrics.instrumented('update_temporal_figure')
+    @figure_cache.cached('update_temporal_figure')
+    def update_temporal_figure(feature):
+        return chart('line_chart').get_cube_figure(data.line_cube, feature)
+
+    @app.callback(
+        Output('radar-figure', 'data'),
+        Input('radar-drill-dropdown', 'value')
+    )
+    @metrics.instrumented('update_radar_figure')
+    def update_radar_figure(drill_genre):
+        if drill_genre == 'all':
+            return static_figures.get('radar')
+        return radar_drilldown_figure(drill_genre)
+
+    for graph_id, dropdown_id, store_id in [
+        ('temporal-graph', 'genre-dropdown', 'temporal-figure'),
+        ('radar-chart', 'radar-genre-dropdown', 'radar-figure'),
+    ]:
+        app.clientside_callback(
+            ClientsideFunction(namespace='genre_filter', function_name='apply'),
+            Output(graph_id, 'figure'),
+            [Input(dropdown_id, 'value'), Input(store_id, 'data')]
+        )
+
+    app.clientside_callback(
+        ClientsideFunction(namespace='time_pyramid', function_name='apply'),
+        Output('stacked-graph', 'figure'),
+        [Input('stacked-genre-dropdown', 'value'), Input('stacked-graph', 'relayoutData'),
+         Input('stacked-figure', 'data')]
+    )
+else:
+    @app.callback(
+        Output('temporal-graph', 'figure'),
+        [Input('feature-dropdown', 'value'), Input('genre-dropdown', 'value')]
+    )
+    @metrics.instrumented('update_temporal')
+    @figure_cache.cached('update_temporal')
+    def update_temporal(feature, genres):
+        return chart('line_chart').get_cube_figure(data.line_cube, feature, genres)
+
+    @app.callback(
+        Output('stacked-graph', 'figure'),
+        [Input('stacked-genre-dropdown', 'value'), Input('stacked-graph', 'relayoutData')]
+    )
+    @metrics.instrumented('update_stacked')
+    def update_stacked(selected_genres, relayout_data):
+        '''
+            Draws the selected genres at the time pyramid level fitting the
+            visible window.
+        '''
+        return stacked_figure(selected_genres, chart('area_chart').visible_window(relayout_data))
+
+    @figure_cache.cached('update_stacked')
+    def stacked_figure(selected_genres, window):
+        return chart('area_chart').get_pyramid_figure(data.stacked_pyramid, selected_genres, window)
+
+    @app.callback(
+        Output('radar-chart', 'figure'),
+        [Input('radar-genre-dropdown', 'value'), Input('radar-drill-dropdown', 'value')]
+    )
+    @metrics.instrumented('update_radar')
+    @figure_cache.cached('update_radar')
+    def update_radar(selected_genres, drill_genre):
+        snapshot = data
+        if drill_genre != 'all':
+            if drill_genre not in selected_genres:
+                return chart('radar_chart').get_figure(snapshot.radar_df.iloc[:0])
+            with metrics.phase('filter'):
+                subgenres = snapshot.hierarchy.breakdown(drill_genre)
+            return chart('radar_chart').get_figure(subgenres, parent_genre=drill_genre)
+        with metrics.phase('filter'):
+            filtered_radar_df = snapshot.radar_df[snapshot.radar_df['Genre'].isin(selected_genres)]
+        return chart('radar_chart').get_figure(filtered_radar_df)
 
 
 @app.callback(
     Output('scatter-chart', 'figure'),
     [Input('scatter-genre-dropdown', 'value'),
-     Input('popularity-slider', 'value')]
+     Input('popularity-slider', 'value'),
+     Input('cross-filter-categories', 'data')],
+    State('cross-filter-region', 'data')
+)
+@metrics.instrumented('update_scatter')
+def update_scatter(selected_genres, popularity_range, categories, region):
+    '''
+        Draws the tracks of the stored bar selection, if any, and redraws
+        the stored region so the scatter keeps showing it.
+    '''
+    figure = scatter_figure(selected_genres, popularity_range, categories)
+    if not region:
+        return figure
+    return dict(figure, layout=dict(figure['layout'], selections=cross_filter.selections(region)))
+
+
+@figure_cache.cached('update_scatter')
+def scatter_figure(selected_genres, popularity_range, categories):
+    with metrics.phase('filter'):
+        filtered = data.scatter_index.query(selected_genres, popularity_range[0], popularity_range[1])
+        selected = cross_filter.category_filter(categories)
+        if selected is not None:
+            filtered = filtered[filtered[selected[0]].isin(selected[1])]
+    return chart('scatter_chart').get_auto_figure(filtered, SCATTER_POINT_LIMIT, lazy_hover=True)
+
+
+@app.callback(
+    Output('scatter-hover-details', 'children'),
+    Input('scatter-chart', 'hoverData')
 )
-def update_scatter(selected_genres, popularity_range):
-    filtered = scatter_df[
-        (scatter_df['playlist_genre'].isin(selected_genres)) &
-        (scatter_df['track_popularity'] >= popularity_range[0]) &
-        (scatter_df['track_popularity'] <= popularity_range[1])
+def scatter_hover_details(hover_data):
+    '''
+        Looks up the hovered track, whose name and artist are not shipped
+        with the scatter figure. Points carry their scatter_df row in
+        customdata[0].
+    '''
+    if not hover_data or not hover_data.get('points'):
+        return "Hover over a point to see the track."
+    customdata = hover_data['points'][0].get('customdata')
+    if not isinstance(customdata, list) or not customdata:
+        return dash.no_update
+    row = int(customdata[0])
+    scatter_df = data.scatter_df
+    if not 0 <= row < len(scatter_df):
+        return dash.no_update
+    track = scatter_df.iloc[row]
+    return [html.B(str(track['track_name'])), f" by {track['track_artist']}"]
+
+
+@app.callback(
+    Output('scatter-similar-tracks', 'children'),
+    Input('scatter-chart', 'clickData')
+)
+@metrics.instrumented('similar_tracks')
+def similar_tracks(click_data):
+    '''
+        Lists the tracks that sound most like the clicked one, by distance
+        between standardized audio-feature vectors (see similarity.py).
+        The same song appears once per playlist in the data, so repeats of
+        a name and artist are skipped.
+    '''
+    if not click_data or not click_data.get('points'):
+        return "Click a point to list tracks with a similar sound."
+    customdata = click_data['points'][0].get('customdata')
+    if not isinstance(customdata, list) or not customdata:
+        return "Narrow the genre or popularity filters to click individual tracks."
+    snapshot = data
+    row = int(customdata[0])
+    scatter_df = snapshot.scatter_df
+    if not 0 <= row < len(scatter_df):
+        return dash.no_update
+    with metrics.phase('filter'):
+        positions, distances = snapshot.similarity.neighbours(row, SIMILAR_TRACKS * 4)
+    names = scatter_df['track_name'].to_numpy()
+    artists = scatter_df['track_artist'].to_numpy()
+    seen = {(str(names[row]), str(artists[row]))}
+    items = []
+    for position, distance in zip(positions, distances):
+        track = (str(names[position]), str(artists[position]))
+        if track in seen:
+            continue
+        seen.add(track)
+        items.append(html.Li([html.B(track[0]), f" by {track[1]} (distance {distance:.2f})"]))
+        if len(items) == SIMILAR_TRACKS:
+            break
+    return [html.B(f"Tracks similar to {names[row]}:"), html.Ol(items)]
+
+
+
+@app.server.before_request
+def check_for_new_revision():
+    '''Picks up store revisions published by ingestion without a restart.'''
+    refresh_data()
+
+
+@app.server.route('/ingest', methods=['POST'])
+def ingest_delta():
+    '''
+        Ingests an uploaded delta CSV (form field 'file'). Requires the
+        DATAVIZ_INGEST_TOKEN value in the X-Ingest-Token header.
+    '''
+    token = request.headers.get('X-Ingest-Token', '')
+    if not INGEST_TOKEN or not hmac.compare_digest(token.encode('utf-8'), INGEST_TOKEN.encode('utf-8')):
+        abort(403)
+    upload = request.files.get('file')
+    if upload is None:
+        abort(400)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        delta_path = os.path.join(tmp_dir, secure_filename(upload.filename or '') or 'delta.csv')
+        upload.save(delta_path)
+        try:
+            accepted = ingest.ingest(delta_path, DATA_PATH)
+        except ValueError as error:
+            return {'error': str(error)}, 400
+    refresh_data(force=True)
+    return {'accepted': accepted, 'revision': data.revision}
+
+
+@app.server.after_request
+def record_callback_payload(response):
+    '''Records the response size of instrumented Dash callbacks.'''
+    callback = g.get('dataviz_callback')
+    if callback is not None:
+        metrics.record_payload(callback, response.calculate_content_length() or 0)
+    return response
+
+
+@app.server.route('/metrics')
+def prometheus_metrics():
+    '''Exports callback latency, payload and cache metrics for Prometheus.'''
+    stats = figure_cache.cache.stats()
+    gauges = [
+        '# HELP dataviz_figure_cache_entries Figures held in the figure cache.',
+        '# TYPE dataviz_figure_cache_entries gauge',
+        f"dataviz_figure_cache_entries {stats['size']}",
+        '# HELP dataviz_figure_cache_evictions_total Figures evicted from the figure cache.',
+        '# TYPE dataviz_figure_cache_evictions_total counter',
+        f"dataviz_figure_cache_evictions_total {stats['evictions']}",
     ]
-    return scatter_chart.get_figure(filtered)
+    return Response(metrics.render(['\n'.join(gauges)]), mimetype='text/plain; version=0.0.4')
+
+
+@app.server.route('/ready')
+def readiness():
+    '''Reports which pages are warm; answers 503 until all of them are.'''
+    pages = {pathname: pathname in _warm_pages for pathname in PAGES}
+    ready = all(pages.values())
+    return {'ready': ready, 'pages': pages}, 200 if ready else 503
+
+
+@app.server.route('/figure-cache')
+def figure_cache_stats():
+    '''Reports figure cache counters so the cache can be sized.'''
+    return figure_cache.cache.stats()
+
+
 
+# Every cached callback is registered by now, so warming can start.
+load_data(warm=WARM_PAGES and not PRELOAD)
 
 
 # --- Run app ---
@@ -1,7 +1,19 @@
+import numpy as np
+import pandas as pd
 import plotly.graph_objects as go
-import plotly.express as px
 from constaints import GENRE_COLORS
 
+# Widest visible window, in years, drawn at each level of the time pyramid;
+# the coarsest level draws any wider window. assets/time_pyramid.js reads
+# these from the figure's layout.meta.
+LEVEL_SPANS = {'year': 40}
+
+RANGE_BUTTONS = [
+    dict(count=10, label="Last 10Y", step="year", stepmode="backward"),
+    dict(count=20, label="Last 20Y", step="year", stepmode="backward"),
+    dict(step="all", label="All Data")
+]
+
 def get_figure(df, selected_genres=None):
     
     """Generates a stacked area chart showing the distribution of genres over time."""
@@ -35,11 +47,131 @@ def get_figure(df, selected_genres=None):
         margin=dict(l=60, r=30, t=60, b=60),
         xaxis=dict(
             rangeselector=dict(
-                buttons=[
-                    dict(count=10, label="Last 10Y", step="year", stepmode="backward"),
-                    dict(count=20, label="Last 20Y", step="year", stepmode="backward"),
-                    dict(step="all", label="All Data")
-                ],
+                buttons=RANGE_BUTTONS,
+                bgcolor='#FFFFFF',
+                activecolor='#1DB954',
+                font=dict(size=14)
+            ),
+            rangeslider=dict(visible=True),
+            type="date"
+        )
+    )
+
+    return fig
+
+
+def visible_window(relayout_data):
+    """
+    Extracts the visible x range from a stacked-graph relayoutData.
+
+    Args:
+        relayout_data (dict): relayoutData of the graph, or None.
+
+    Returns:
+        tuple: (start, end) as np.datetime64, or None for the full range.
+    """
+    if not relayout_data:
+        return None
+    if 'xaxis.range[0]' in relayout_data and 'xaxis.range[1]' in relayout_data:
+        bounds = [relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']]
+    elif 'xaxis.range' in relayout_data:
+        bounds = relayout_data['xaxis.range']
+    else:
+        return None
+    try:
+        start, end = sorted(pd.Timestamp(bound).to_datetime64() for bound in bounds)
+    except (TypeError, ValueError):
+        return None
+    return start, end
+
+
+def level_for(pyramid, window=None):
+    """
+    Picks the finest level of a TimePyramid whose span covers a window.
+
+    Args:
+        pyramid (TimePyramid): Output of preprocess.stacked_pyramid.
+        window (tuple): Visible (start, end), or None for the full range.
+
+    Returns:
+        TimeLevel: The level to draw.
+    """
+    finest = pyramid.levels[0]
+    if window is None and len(finest.x):
+        window = (finest.x[0], finest.x[-1])
+    years = (window[1] - window[0]) / np.timedelta64(1, 'D') / 365.25 if window is not None else 0
+    for level in pyramid.levels[:-1]:
+        if years <= LEVEL_SPANS.get(level.name, 0):
+            return level
+    return pyramid.levels[-1]
+
+
+def get_pyramid_figure(pyramid, selected_genres=None, window=None):
+    """
+    Generates the stacked area chart from a TimePyramid.
+
+    Genres are columns of the level matrices, so filtering is a column
+    selection. Every level is drawn as its own stack group, and only the
+    level fitting the window is visible; assets/time_pyramid.js switches
+    levels in the browser as the window changes. With a window, the y axis
+    is fitted to the stacks inside it.
+
+    Args:
+        pyramid (TimePyramid): Output of preprocess.stacked_pyramid.
+        selected_genres (list): Genres to draw, or None for all.
+        window (tuple): Visible (start, end) from visible_window, or None.
+
+    Returns:
+        go.Figure: The stacked area chart.
+    """
+    columns = [i for i, genre in enumerate(pyramid.genres)
+               if selected_genres is None or genre in selected_genres]
+    shown = level_for(pyramid, window)
+
+    fig = go.Figure()
+    for level in pyramid.levels:
+        x = np.datetime_as_string(level.x, unit='s').tolist()
+        for i in columns:
+            genre = pyramid.genres[i]
+            fig.add_trace(go.Scatter(
+                x=x,
+                y=level.counts[:, i],
+                mode='lines',
+                stackgroup=level.name,
+                name=genre,
+                meta=genre,
+                visible=level is shown,
+                line=dict(width=2, color=GENRE_COLORS.get(genre.lower(), '#17becf'))
+            ))
+
+    yaxis = dict()
+    if window is not None and columns and len(shown.x):
+        # One point past each edge: the areas are interpolated up to it.
+        first = max(np.searchsorted(shown.x, window[0], side='right') - 1, 0)
+        last = np.searchsorted(shown.x, window[1], side='left') + 1
+        if len(columns) == len(pyramid.genres):
+            tops = shown.stacks[first:last, -1]
+        else:
+            tops = shown.counts[first:last][:, columns].sum(axis=1)
+        if len(tops) and tops.max() > 0:
+            yaxis['range'] = [0, float(tops.max()) * 1.05]
+
+    fig.update_layout(
+        title='Genre Distribution Over Time',
+        xaxis_title='Release Year',
+        yaxis_title='Number of Songs',
+        legend=dict(title='Genre', font=dict(size=14)),
+        font=dict(family="Segoe UI, Lato, Arial", size=16, color="#222"),
+        hovermode='x unified',
+        plot_bgcolor="#f8f9fa",
+        paper_bgcolor="white",
+        margin=dict(l=60, r=30, t=60, b=60),
+        meta=dict(levels=[[level.name, LEVEL_SPANS.get(level.name)] for level in pyramid.levels]),
+        uirevision='stacked',
+        yaxis=yaxis,
+        xaxis=dict(
+            rangeselector=dict(
+                buttons=RANGE_BUTTONS,
                 bgcolor='#FFFFFF',
                 activecolor='#1DB954',
                 font=dict(size=14)
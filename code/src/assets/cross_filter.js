@@ -0,0 +1,36 @@
+// Linked selections for the Bar, Scatter and Violin pages.
+// Each chart's selection is copied into a dcc.Store of the app layout, so it
+// outlives page changes and the other pages filter on it (cross_filter.py).
+// Only the labels or the region geometry are stored, never the points.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    cross_filter: {
+        categories: function (selectedData, drillGenre) {
+            const triggered = window.dash_clientside.callback_context.triggered.map(function (trigger) {
+                return trigger.prop_id;
+            });
+            // A new drill level shows other bars, so the old selection ends.
+            if (triggered.indexOf('bar-drill-dropdown.value') !== -1) {
+                return null;
+            }
+            if (!selectedData || !selectedData.points || !selectedData.points.length) {
+                return null;
+            }
+            const values = new Set(selectedData.points.map(function (point) {
+                return String(point.x);
+            }));
+            return {
+                column: drillGenre === 'all' ? 'playlist_genre' : 'playlist_subgenre',
+                values: Array.from(values).sort()
+            };
+        },
+        region: function (selectedData) {
+            if (selectedData && selectedData.range && selectedData.range.x) {
+                return {range: {x: selectedData.range.x, y: selectedData.range.y}};
+            }
+            if (selectedData && selectedData.lassoPoints && selectedData.lassoPoints.x) {
+                return {lassoPoints: {x: selectedData.lassoPoints.x, y: selectedData.lassoPoints.y}};
+            }
+            return null;
+        }
+    }
+});
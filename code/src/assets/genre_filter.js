@@ -0,0 +1,23 @@
+// Clientside genre filtering for the line, stacked and radar pages.
+// The server sends the figure with every genre once; changing the genre
+// dropdown only toggles trace visibility here, without a server round trip.
+// Subgenre traces carry their parent genre in trace.meta.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    genre_filter: {
+        apply: function (genres, figure) {
+            if (!figure) {
+                return window.dash_clientside.no_update;
+            }
+            const selected = new Set((genres || []).map(function (genre) {
+                return String(genre).toLowerCase();
+            }));
+            return Object.assign({}, figure, {
+                data: figure.data.map(function (trace) {
+                    return Object.assign({}, trace, {
+                        visible: selected.has(String(trace.meta !== undefined ? trace.meta : trace.name).toLowerCase())
+                    });
+                })
+            });
+        }
+    }
+});
@@ -0,0 +1,115 @@
+// Resolution switching for the stacked area chart (area_chart.get_pyramid_figure).
+// The figure holds one stack group per level of the time pyramid, finest
+// first, with the widest window each level draws in layout.meta.levels.
+// Zooming, dragging the range slider or pressing a range selector button
+// shows the level fitting the visible window, for the selected genres only,
+// and fits the y axis to the stacks inside the window.
+(function () {
+    const YEAR_MS = 365.25 * 24 * 3600 * 1000;
+    const DTYPES = {
+        f4: Float32Array, f8: Float64Array, i1: Int8Array, u1: Uint8Array,
+        i2: Int16Array, u2: Uint16Array, i4: Int32Array, u4: Uint32Array
+    };
+
+    function toTime(value) {
+        return Date.parse(String(value).trim().replace(' ', 'T') + (/[zZ]|[+-]\d\d:\d\d$/.test(value) ? '' : 'Z'));
+    }
+
+    // Arrays may arrive as Plotly typed-array specs (figure_cache.typed_array).
+    function values(array) {
+        if (!array || Array.isArray(array)) {
+            return array || [];
+        }
+        const bytes = Uint8Array.from(atob(array.bdata), function (c) { return c.charCodeAt(0); });
+        return Array.from(new DTYPES[array.dtype](bytes.buffer));
+    }
+
+    function visibleWindow(relayoutData) {
+        if (!relayoutData) {
+            return null;
+        }
+        let bounds = null;
+        if ('xaxis.range[0]' in relayoutData && 'xaxis.range[1]' in relayoutData) {
+            bounds = [relayoutData['xaxis.range[0]'], relayoutData['xaxis.range[1]']];
+        } else if (Array.isArray(relayoutData['xaxis.range'])) {
+            bounds = relayoutData['xaxis.range'];
+        }
+        if (!bounds) {
+            return null;
+        }
+        const times = bounds.map(toTime).sort(function (a, b) { return a - b; });
+        return isNaN(times[0]) || isNaN(times[1]) ? null : times;
+    }
+
+    function levelFor(levels, traces, window_) {
+        if (!window_) {
+            const finest = traces.filter(function (trace) { return trace.stackgroup === levels[0][0]; });
+            const x = finest.length ? finest[0].x : [];
+            window_ = x.length ? [toTime(x[0]), toTime(x[x.length - 1])] : [0, 0];
+        }
+        const years = (window_[1] - window_[0]) / YEAR_MS;
+        for (let i = 0; i < levels.length - 1; i++) {
+            if (levels[i][1] !== null && years <= levels[i][1]) {
+                return levels[i][0];
+            }
+        }
+        return levels[levels.length - 1][0];
+    }
+
+    function stackTop(traces, window_) {
+        let top = 0;
+        const totals = [];
+        traces.forEach(function (trace) {
+            values(trace.y).forEach(function (y, i) {
+                totals[i] = (totals[i] || 0) + (y || 0);
+            });
+        });
+        if (!traces.length) {
+            return top;
+        }
+        // One point past each edge: the areas are interpolated up to it.
+        const x = traces[0].x.map(toTime);
+        totals.forEach(function (total, i) {
+            const inside = (i + 1 < x.length ? x[i + 1] : Infinity) > window_[0]
+                && (i > 0 ? x[i - 1] : -Infinity) < window_[1];
+            if (inside && total > top) {
+                top = total;
+            }
+        });
+        return top;
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        time_pyramid: {
+            apply: function (genres, relayoutData, figure) {
+                if (!figure) {
+                    return window.dash_clientside.no_update;
+                }
+                const selected = new Set((genres || []).map(function (genre) {
+                    return String(genre).toLowerCase();
+                }));
+                const levels = figure.layout.meta.levels;
+                const window_ = visibleWindow(relayoutData);
+                const level = levelFor(levels, figure.data, window_);
+                const data = figure.data.map(function (trace) {
+                    return Object.assign({}, trace, {
+                        visible: trace.stackgroup === level && selected.has(String(trace.meta).toLowerCase())
+                    });
+                });
+                const top = window_ ? stackTop(data.filter(function (trace) { return trace.visible; }), window_) : 0;
+                const yaxis = Object.assign({}, figure.layout.yaxis);
+                if (top > 0) {
+                    yaxis.range = [0, top * 1.05];
+                    yaxis.autorange = false;
+                } else {
+                    delete yaxis.range;
+                    yaxis.autorange = true;
+                }
+                return Object.assign({}, figure, {
+                    data: data,
+                    layout: Object.assign({}, figure.layout, {yaxis: yaxis})
+                });
+            }
+        }
+    });
+})();
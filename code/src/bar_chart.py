@@ -44,3 +44,17 @@ def get_figure(df):
     )
 
     return fig
+
+
+def get_drilldown_figure(df, genre):
+    """Generates the bar chart one level down: average popularity of the subgenres of genre."""
+
+    fig = get_figure(df)
+    fig.update_traces(marker_color=GENRE_COLORS.get(genre, '#17becf'))
+    fig.update_layout(
+        title=dict(text=f"Average Track Popularity by Subgenre of {genre.title()}"),
+        xaxis_title="Playlist Subgenre",
+        yaxis=dict(range=[0, max(50, df['Average Popularity'].max() * 1.1)])
+    )
+
+    return fig
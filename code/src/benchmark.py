@@ -0,0 +1,261 @@
+'''
+    Benchmarks the preprocess functions and chart builders at scaled dataset
+    sizes.
+
+    A synthetic dataset with the spotify_songs.csv schema is generated at
+    each size, typed like dataset.read_csv. Every preprocess.*_df function
+    and every chart get_figure is then timed (best of --repeat runs),
+    memory-profiled (tracemalloc peak of a separate run) and, for figures,
+    serialized to measure the JSON payload in bytes. With --streaming, the
+    single-pass out-of-core build of streaming.py is also measured from a
+    CSV of each dataset. Results are written as JSON so runs can be compared
+    between commits.
+
+        python benchmark.py --sizes 30000 300000 3000000 --output bench.json
+'''
+import argparse
+import json
+import platform
+import os
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import plotly
+
+import dataset
+import preprocess
+import streaming
+from bitmap_index import BitmapIndex
+from cross_filter import CrossFilter
+from similarity import SimilarityIndex
+import bar_chart
+import line_chart
+import area_chart
+import radar_chart
+import scatter_chart
+import violin_plots
+
+DEFAULT_SIZES = [30000, 300000, 3000000]
+
+SUBGENRES = {
+    'pop': ['dance pop', 'post-teen pop', 'electropop', 'indie poptimism'],
+    'rap': ['hip hop', 'southern hip hop', 'gangster rap', 'trap'],
+    'rock': ['album rock', 'classic rock', 'permanent wave', 'hard rock'],
+    'latin': ['tropical', 'latin pop', 'reggaeton', 'latin hip hop'],
+    'r&b': ['urban contemporary', 'hip pop', 'new jack swing', 'neo soul'],
+    'edm': ['electro house', 'big room', 'pop edm', 'progressive electro house'],
+}
+
+
+def generate(n_rows, seed=0):
+    """
+    Generates a synthetic dataset with the spotify_songs.csv schema.
+
+    Feature ranges and the mix of release date precisions follow the real
+    export, so binning, filtering and date parsing do representative work.
+
+    Args:
+        n_rows (int): Number of tracks.
+        seed (int): Random seed.
+
+    Returns:
+        pd.DataFrame: Frame typed like the output of dataset.read_csv.
+    """
+    rng = np.random.default_rng(seed)
+    ids = pd.Series(np.arange(n_rows)).astype(str)
+    genre_names = list(SUBGENRES)
+    genre_idx = rng.integers(0, len(genre_names), n_rows)
+    subgenre_idx = rng.integers(0, 4, n_rows)
+    subgenre_names = np.array([SUBGENRES[g][i] for g in genre_names for i in range(4)])
+
+    years = (2020 - np.minimum(rng.exponential(12, n_rows), 63)).astype(int).astype(str)
+    months = pd.Series(rng.integers(1, 13, n_rows)).map('{:02d}'.format)
+    days = pd.Series(rng.integers(1, 29, n_rows)).map('{:02d}'.format)
+    years = pd.Series(years)
+    precision = rng.random(n_rows)
+    dates = years.where(precision < 0.08, years + '-' + months)
+    dates = dates.where(precision < 0.1, dates + '-' + days)
+
+    albums = ids.str.slice(0, -1)
+    playlists = pd.Series(rng.integers(0, max(n_rows // 70, 1), n_rows)).astype(str)
+    raw = pd.DataFrame({
+        'track_id': 'trk' + ids,
+        'track_name': 'Song ' + ids,
+        'track_artist': 'Artist ' + pd.Series(rng.integers(0, max(n_rows // 3, 1), n_rows)).astype(str),
+        'track_popularity': np.clip(rng.normal(42, 25, n_rows), 0, 100).astype(int),
+        'track_album_id': 'alb' + albums,
+        'track_album_name': 'Album ' + albums,
+        'track_album_release_date': dates,
+        'playlist_name': 'Playlist ' + playlists,
+        'playlist_id': 'pl' + playlists,
+        'playlist_genre': np.array(genre_names)[genre_idx],
+        'playlist_subgenre': subgenre_names[genre_idx * 4 + subgenre_idx],
+        'danceability': rng.beta(5, 3, n_rows),
+        'energy': rng.beta(5, 2, n_rows),
+        'key': rng.integers(0, 12, n_rows),
+        'loudness': rng.normal(-6.7, 3, n_rows),
+        'mode': rng.integers(0, 2, n_rows),
+        'speechiness': rng.beta(1, 8, n_rows),
+        'acousticness': rng.beta(1, 4, n_rows),
+        'instrumentalness': rng.beta(0.2, 3, n_rows),
+        'liveness': rng.beta(2, 8, n_rows),
+        'valence': rng.beta(3, 3, n_rows),
+        'tempo': rng.normal(121, 27, n_rows).clip(40, 240),
+        'duration_ms': rng.normal(225000, 60000, n_rows).clip(30000, 600000).astype(int),
+    })
+    raw.loc[::1000, 'track_name'] = np.nan
+    df = raw.astype(dataset.CSV_DTYPES)
+    df['release_year'] = dataset.parse_release_years(df['track_album_release_date'])
+    return df
+
+
+def measure(func, repeat):
+    """
+    Times and memory-profiles one call.
+
+    Timing runs are not traced, since tracemalloc slows allocation-heavy
+    code; the peak comes from one extra traced run.
+
+    Args:
+        func (callable): Called with no arguments.
+        repeat (int): Number of timed runs.
+
+    Returns:
+        tuple: (result of the last run, dict with 'seconds' (best run) and
+        'peak_bytes').
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, {'seconds': best, 'peak_bytes': peak}
+
+
+def measure_figure(build, repeat):
+    """
+    Measures a chart builder plus the JSON serialization of its figure.
+
+    Args:
+        build (callable): Returns a go.Figure.
+        repeat (int): Number of timed runs.
+
+    Returns:
+        dict: Build 'seconds' and 'peak_bytes', 'serialize_seconds' and the
+        serialized figure size in 'figure_bytes'.
+    """
+    fig, stats = measure(build, repeat)
+    payload, serialize_stats = measure(fig.to_json, repeat)
+    stats['serialize_seconds'] = serialize_stats['seconds']
+    stats['figure_bytes'] = len(payload.encode('utf-8'))
+    return stats
+
+
+def run(n_rows, repeat=3, stream=False):
+    """
+    Runs every benchmark at one dataset size.
+
+    Args:
+        n_rows (int): Number of synthetic tracks.
+        repeat (int): Number of timed runs per benchmark.
+        stream (bool): Also measure streaming.build_tables.
+
+    Returns:
+        dict: 'preprocess', 'indexes' and 'figures' results keyed by name,
+        plus 'streaming' when stream is set.
+    """
+    df = generate(n_rows)
+    tables = {}
+    results = {'rows': n_rows, 'preprocess': {}, 'figures': {}}
+    for name in ['bar_chart_df', 'line_chart_df', 'area_chart_df', 'radar_chart_df',
+                 'violin_plots_df', 'violin_counts_df', 'scatter_chart_df', 'hierarchy_df', 'tracks_df']:
+        func = getattr(preprocess, name)
+        tables[name], results['preprocess'][name] = measure(lambda func=func: func(df), repeat)
+
+    results['indexes'] = {}
+    index, results['indexes']['BitmapIndex'] = measure(lambda: BitmapIndex(tables['tracks_df']), repeat)
+    results['indexes']['BitmapIndex.select'] = measure(
+        lambda: index.count(index.select({'playlist_genre': ['pop', 'rap'], 'mode': [1]}, (20, 80))), repeat)[1]
+    cross, results['indexes']['CrossFilter'] = measure(lambda: CrossFilter(tables['tracks_df'], index), repeat)
+    angles = np.linspace(0, 2 * np.pi, 64, endpoint=False)
+    lasso = {'lassoPoints': {'x': list(0.6 + 0.25 * np.cos(angles)), 'y': list(0.5 + 0.3 * np.sin(angles))}}
+    results['indexes']['CrossFilter.rows'] = measure(
+        lambda: cross.rows({'column': 'playlist_genre', 'values': ['pop', 'rap']}, lasso), repeat)[1]
+    scatter_rows = preprocess.scatter_chart_df(df, sample_size=None)
+    similar, results['indexes']['SimilarityIndex'] = measure(lambda: SimilarityIndex(scatter_rows), repeat)
+    results['indexes']['SimilarityIndex.neighbours'] = measure(lambda: similar.neighbours(0, 40), repeat)[1]
+
+    figures = {
+        'bar_chart': lambda: bar_chart.get_figure(tables['bar_chart_df']),
+        'line_chart': lambda: line_chart.get_figure(tables['line_chart_df']),
+        'line_chart.cube': lambda: line_chart.get_cube_figure(
+            preprocess.line_chart_cube(tables['line_chart_df'])),
+        'area_chart': lambda: area_chart.get_figure(tables['area_chart_df']),
+        'area_chart.pyramid': lambda: area_chart.get_pyramid_figure(
+            preprocess.stacked_pyramid(tables['area_chart_df'])),
+        'radar_chart': lambda: radar_chart.get_figure(tables['radar_chart_df']),
+        'scatter_chart': lambda: scatter_chart.get_figure(tables['scatter_chart_df']),
+        'scatter_chart.density': lambda: scatter_chart.get_density_figure(
+            preprocess.scatter_chart_df(df, sample_size=None)),
+        'violin_plots.raw': lambda: violin_plots.get_figure(tables['violin_plots_df'], mode='raw'),
+        'violin_plots.summary': lambda: violin_plots.get_figure(tables['violin_plots_df'], mode='summary'),
+        'violin_plots.counts': lambda: violin_plots.get_counts_figure(tables['violin_counts_df']),
+    }
+    for name, build in figures.items():
+        results['figures'][name] = measure_figure(build, repeat)
+
+    if stream:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            csv_path = os.path.join(tmp_dir, 'spotify_songs.csv')
+            df.drop(columns=['release_year']).to_csv(csv_path, index=False)
+            results['streaming'] = measure(lambda: streaming.build_tables(csv_path), 1)[1]
+            results['streaming']['csv_bytes'] = os.path.getsize(csv_path)
+    return results
+
+
+def git_commit():
+    """Returns the git commit hash of this checkout, or None outside a repository."""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Dataset sizes in rows.')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per benchmark.')
+    parser.add_argument('--output', default='benchmark.json', help='Path of the JSON results.')
+    parser.add_argument('--streaming', action='store_true', help='Also measure the out-of-core build.')
+    args = parser.parse_args()
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'plotly': plotly.__version__,
+        'repeat': args.repeat,
+        'runs': [],
+    }
+    for n_rows in args.sizes:
+        print(f'Benchmarking {n_rows} rows...')
+        report['runs'].append(run(n_rows, args.repeat, args.streaming))
+    with open(args.output, 'w', encoding='utf-8') as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f'Wrote {args.output}')
+
+
+if __name__ == '__main__':
+    main()
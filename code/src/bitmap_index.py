@@ -0,0 +1,166 @@
+'''
+    Bitmap index over the categorical and binned columns of the track table.
+
+    Every value of an indexed column owns a packed bitset with one bit per
+    row, so any filter combination resolves with bitwise OR (values of one
+    column) and AND (across columns), and a popcount gives its size without
+    touching the rows. Popularity is range-encoded: bitmap v holds the rows
+    with popularity <= v, so a [low, high] range costs one AND NOT.
+'''
+import numpy as np
+
+import preprocess
+
+INDEXED_COLUMNS = ['playlist_genre', 'playlist_subgenre', 'mode', 'key'] + list(preprocess.VIOLIN_BINS)
+
+RANGE_COLUMN = 'track_popularity'
+
+if hasattr(np, 'bitwise_count'):
+    def _popcount(words):
+        return int(np.bitwise_count(words).sum())
+else:  # NumPy < 2.0
+    _BYTE_COUNTS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(words):
+        return int(_BYTE_COUNTS[words.view(np.uint8)].sum(dtype=np.int64))
+
+
+class BitmapIndex:
+    """
+    Packed bitsets per column value, combined with bitwise operations.
+    """
+
+    def __init__(self, df, columns=None, range_column=RANGE_COLUMN):
+        self.n_rows = len(df)
+        self.n_words = (self.n_rows + 63) // 64
+        self.values = {}
+        self._bitmaps = {}
+        for column in INDEXED_COLUMNS if columns is None else columns:
+            series = df[column]
+            if hasattr(series, 'cat'):
+                labels = [str(label) for label in series.cat.categories]
+                codes = series.cat.codes.to_numpy()
+            else:
+                uniques, codes = np.unique(series.to_numpy(), return_inverse=True)
+                labels = [value.item() for value in uniques]
+            self.values[column] = labels
+            self._bitmaps[column] = {label: self._pack(codes == i) for i, label in enumerate(labels)}
+
+        self.range_column = range_column
+        values = df[range_column].to_numpy()
+        self.range_min = int(values.min()) if len(values) else 0
+        self.range_max = int(values.max()) if len(values) else -1
+        self._ranges = [self._pack(values <= v) for v in range(self.range_min, self.range_max + 1)]
+
+    def _pack(self, mask):
+        packed = np.zeros(self.n_words * 8, dtype=np.uint8)
+        packed[:(self.n_rows + 7) // 8] = np.packbits(mask)
+        return packed.view(np.uint64)
+
+    def empty(self):
+        """Returns the bitmap with no rows set."""
+        return np.zeros(self.n_words, dtype=np.uint64)
+
+    def full(self):
+        """Returns the bitmap with every row set."""
+        return self._pack(np.ones(self.n_rows, dtype=bool))
+
+    def bitmap(self, column, value):
+        """
+        Returns the rows where column equals value.
+
+        Args:
+            column (str): Indexed column.
+            value: Column value (category label or number).
+
+        Returns:
+            np.ndarray: Packed uint64 bitmap; empty for unknown values.
+        """
+        bitmaps = self._bitmaps[column]
+        bitmap = bitmaps.get(value)
+        if bitmap is None:
+            bitmap = bitmaps.get(str(value))
+        return bitmap if bitmap is not None else self.empty()
+
+    def any_of(self, column, values):
+        """
+        Returns the rows where column takes any of values (bitwise OR).
+
+        Args:
+            column (str): Indexed column.
+            values (list): Accepted values.
+
+        Returns:
+            np.ndarray: Packed bitmap.
+        """
+        result = self.empty()
+        for value in values:
+            np.bitwise_or(result, self.bitmap(column, value), out=result)
+        return result
+
+    def between(self, low, high):
+        """
+        Returns the rows whose range column lies in [low, high].
+
+        Args:
+            low (int): Lowest value, inclusive.
+            high (int): Highest value, inclusive.
+
+        Returns:
+            np.ndarray: Packed bitmap.
+        """
+        low, high = max(int(low), self.range_min), min(int(high), self.range_max)
+        if low > high:
+            return self.empty()
+        upper = self._ranges[high - self.range_min]
+        if low == self.range_min:
+            return upper.copy()
+        return np.bitwise_and(upper, np.invert(self._ranges[low - 1 - self.range_min]))
+
+    def select(self, filters=None, popularity=None):
+        """
+        Resolves a filter combination: OR within a column, AND across columns.
+
+        Args:
+            filters (dict): Indexed column to the list of accepted values;
+                None or missing columns do not filter.
+            popularity (tuple): (low, high) range of the range column, or None.
+
+        Returns:
+            np.ndarray: Packed bitmap of the matching rows.
+        """
+        result = self.full()
+        for column, values in (filters or {}).items():
+            if values is not None:
+                np.bitwise_and(result, self.any_of(column, values), out=result)
+        if popularity is not None:
+            np.bitwise_and(result, self.between(*popularity), out=result)
+        return result
+
+    def count(self, bitmap):
+        """Returns the number of rows set in bitmap."""
+        return _popcount(bitmap)
+
+    def mask(self, bitmap):
+        """Returns bitmap as a boolean array with one entry per row."""
+        return np.unpackbits(bitmap.view(np.uint8), count=self.n_rows).astype(bool)
+
+    def positions(self, bitmap):
+        """Returns the row positions set in bitmap."""
+        return np.flatnonzero(self.mask(bitmap))
+
+    def counts(self, column, bitmap):
+        """
+        Counts the rows of bitmap per value of column (AND + popcount).
+
+        Args:
+            column (str): Indexed column.
+            bitmap (np.ndarray): Packed bitmap.
+
+        Returns:
+            dict: Value to number of rows.
+        """
+        return {
+            value: _popcount(np.bitwise_and(bitmap, value_bitmap))
+            for value, value_bitmap in self._bitmaps[column].items()
+        }
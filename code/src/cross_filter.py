@@ -0,0 +1,173 @@
+'''
+    Linked selections between the Bar, Scatter and Violin pages.
+
+    Selecting bars stores the picked genres (or subgenres, once drilled
+    down), and a box or lasso selection on the energy/valence scatter stores
+    the region, in dcc.Stores that outlive page changes. A linked view turns
+    the selections it does not own into a set of track rows, categories
+    through the bitmap index and the region through a mask over the track
+    table, and recomputes its aggregates from those rows alone.
+
+    Lasso regions are rasterized by scanline onto a GRID_SIZE x GRID_SIZE
+    grid over [0, 1] x [0, 1], and every track looks up its precomputed
+    cell, so a lasso costs the same whatever its vertex count. Box regions
+    are compared exactly.
+'''
+import numpy as np
+import pandas as pd
+
+# Columns a bar selection may filter on: the bar chart's two drill levels.
+LINKED_COLUMNS = ['playlist_genre', 'playlist_subgenre']
+
+GRID_SIZE = 1024
+
+
+def polygon_grid(xs, ys, size=GRID_SIZE):
+    """
+    Rasterizes a polygon onto a regular grid over [0, 1] x [0, 1].
+
+    A cell is inside when its center is (even-odd rule). Per grid row, the
+    x crossings of the row's center line with the polygon edges are sorted
+    and every cell counts the crossings to its left.
+
+    Args:
+        xs (list): Vertex x coordinates.
+        ys (list): Vertex y coordinates.
+        size (int): Cells per axis.
+
+    Returns:
+        np.ndarray: Boolean grid of shape (size, size), indexed [y cell, x cell].
+    """
+    x0 = np.asarray(xs, dtype=np.float64)
+    y0 = np.asarray(ys, dtype=np.float64)
+    x1 = np.roll(x0, -1)
+    y1 = np.roll(y0, -1)
+    centers = (np.arange(size) + 0.5) / size
+    line = centers[:, None]
+    crosses = (y0 <= line) != (y1 <= line)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        crossing_x = np.where(crosses, x0 + (line - y0) / (y1 - y0) * (x1 - x0), np.inf)
+    crossing_x.sort(axis=1)
+    grid = np.empty((size, size), dtype=bool)
+    for row in range(size):
+        grid[row] = np.searchsorted(crossing_x[row], centers) % 2 == 1
+    return grid
+
+
+def category_filter(categories):
+    """
+    Validates a stored bar selection.
+
+    Args:
+        categories (dict): {'column': ..., 'values': [...]} as stored by the
+            bar chart, or None.
+
+    Returns:
+        tuple: (column, values), or None when nothing valid is selected.
+    """
+    if not isinstance(categories, dict) or categories.get('column') not in LINKED_COLUMNS:
+        return None
+    values = [str(value) for value in categories.get('values') or []]
+    return (categories['column'], values) if values else None
+
+
+def selections(region):
+    """
+    Draws a stored scatter region as layout.selections, so a rebuilt
+    scatter figure keeps showing it.
+
+    Args:
+        region (dict): {'range': {'x': [x0, x1], 'y': [y0, y1]}} or
+            {'lassoPoints': {'x': [...], 'y': [...]}}, or None.
+
+    Returns:
+        list: Selection dicts for the figure layout.
+    """
+    if not region:
+        return []
+    if 'range' in region:
+        (x0, x1), (y0, y1) = region['range']['x'], region['range']['y']
+        return [dict(type='rect', xref='x', yref='y', x0=x0, x1=x1, y0=y0, y1=y1)]
+    points = region['lassoPoints']
+    path = 'M' + 'L'.join(f'{x},{y}' for x, y in zip(points['x'], points['y'])) + 'Z'
+    return [dict(type='path', xref='x', yref='y', path=path)]
+
+
+class CrossFilter:
+    """
+    Resolves linked selections to rows of the track table.
+    """
+
+    def __init__(self, tracks, index, grid_size=GRID_SIZE):
+        self.tracks = tracks
+        self.index = index
+        self.grid_size = grid_size
+        self.energy = tracks['energy'].to_numpy()
+        self.valence = tracks['valence'].to_numpy()
+        x = np.clip((self.energy * grid_size).astype(np.int32), 0, grid_size - 1)
+        y = np.clip((self.valence * grid_size).astype(np.int32), 0, grid_size - 1)
+        self.cells = y * grid_size + x
+
+    def region_mask(self, region):
+        """
+        Returns which tracks lie in a scatter region.
+
+        Args:
+            region (dict): See selections().
+
+        Returns:
+            np.ndarray: Boolean mask over the track table.
+        """
+        if 'range' in region:
+            (x0, x1), (y0, y1) = region['range']['x'], region['range']['y']
+            return ((self.energy >= min(x0, x1)) & (self.energy <= max(x0, x1))
+                    & (self.valence >= min(y0, y1)) & (self.valence <= max(y0, y1)))
+        points = region['lassoPoints']
+        grid = polygon_grid(points['x'], points['y'], self.grid_size)
+        return grid.ravel()[self.cells]
+
+    def rows(self, categories=None, region=None, filters=None):
+        """
+        Returns the tracks matching the linked selections.
+
+        Args:
+            categories (dict): Stored bar selection, or None.
+            region (dict): Stored scatter region, or None.
+            filters (dict): Further bitmap index filters, e.g. a drilled genre.
+
+        Returns:
+            np.ndarray: Row positions into the track table.
+        """
+        bitmap = self.index.select(filters)
+        selected = category_filter(categories)
+        if selected is not None:
+            np.bitwise_and(bitmap, self.index.any_of(*selected), out=bitmap)
+        mask = self.index.mask(bitmap)
+        if region:
+            mask &= self.region_mask(region)
+        return np.flatnonzero(mask)
+
+    def means(self, column, rows):
+        """
+        Averages popularity per value of column over some tracks.
+
+        Args:
+            column (str): Categorical column of the track table.
+            rows (np.ndarray): Row positions into the track table.
+
+        Returns:
+            pd.DataFrame: 'Genre' and 'Average Popularity' for every value
+            with tracks, most popular first, as preprocess.bar_chart_df.
+        """
+        values = self.tracks[column].astype('category').cat
+        codes = values.codes.to_numpy()[rows]
+        popularity = self.tracks['track_popularity'].to_numpy()[rows]
+        valid = codes >= 0
+        n = len(values.categories)
+        counts = np.bincount(codes[valid], minlength=n)
+        sums = np.bincount(codes[valid], weights=popularity[valid], minlength=n)
+        present = counts > 0
+        return pd.DataFrame({
+            'Genre': [str(label) for label in values.categories[present]],
+            'Average Popularity': sums[present] / counts[present],
+        }).sort_values(by='Average Popularity', ascending=False)
@@ -0,0 +1,250 @@
+'''
+    Loads the Spotify dataset through a typed columnar cache.
+
+    The CSV is parsed once with explicit dtypes and written as one .npy file
+    per column under a directory named after the CSV's size and mtime. Later
+    loads read those arrays back directly, so worker processes and restarts
+    skip CSV parsing and type inference entirely. Changing the CSV changes
+    its fingerprint, which triggers a rebuild on the next load.
+'''
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = os.environ.get(
+    'DATAVIZ_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+)
+
+# Bump when read_csv's output schema changes so existing caches are rebuilt.
+CACHE_VERSION = 3
+
+# release_year value for release dates that cannot be parsed.
+MISSING_YEAR = 0
+
+CATEGORICAL_COLUMNS = ['playlist_genre', 'playlist_subgenre']
+
+STRING_COLUMNS = [
+    'track_id', 'track_name', 'track_artist', 'track_album_id', 'track_album_name',
+    'track_album_release_date', 'playlist_name', 'playlist_id'
+]
+
+FLOAT_COLUMNS = [
+    'danceability', 'energy', 'loudness', 'speechiness', 'acousticness',
+    'instrumentalness', 'liveness', 'valence', 'tempo'
+]
+
+INT_COLUMNS = {
+    'track_popularity': 'int16',
+    'key': 'int8',
+    'mode': 'int8',
+    'duration_ms': 'int32',
+}
+
+CSV_DTYPES = {
+    **{col: 'float32' for col in FLOAT_COLUMNS},
+    **INT_COLUMNS,
+    **{col: 'category' for col in CATEGORICAL_COLUMNS},
+}
+
+
+def parse_release_years(dates):
+    """
+    Extracts the year of mixed-precision release dates as a compact int16.
+
+    Args:
+        dates (pd.Series): Release date strings.
+
+    Returns:
+        pd.Series: int16 years, MISSING_YEAR where no year can be parsed.
+    """
+    years = pd.to_numeric(dates.str[:4], errors='coerce')
+    return years.fillna(MISSING_YEAR).astype(np.int16)
+
+
+def read_csv(csv_path):
+    """
+    Parses the raw CSV with explicit dtypes.
+
+    Args:
+        csv_path (str): Path to spotify_songs.csv.
+
+    Returns:
+        pd.DataFrame: Typed frame with an extra int16 'release_year' column,
+        the only part of the release date any table reads.
+    """
+    df = pd.read_csv(csv_path, dtype=CSV_DTYPES)
+    df['release_year'] = parse_release_years(df['track_album_release_date'])
+    return df
+
+
+def track_hashes(track_ids):
+    """
+    Hashes track ids to uint64, for deduplication without keeping the strings.
+
+    Args:
+        track_ids (pd.Series): Track id strings.
+
+    Returns:
+        np.ndarray: One uint64 hash per id.
+    """
+    return pd.util.hash_pandas_object(track_ids.astype(str), index=False).to_numpy()
+
+
+def write_columns(df, path, extra_meta=None):
+    """
+    Writes a dataframe as one .npy file per column plus a meta.json schema.
+
+    Categorical and string columns are dictionary-encoded: integer codes go
+    to the .npy file and the categories to meta.json. Datetime columns are
+    stored as their int64 nanosecond view.
+
+    Args:
+        df (pd.DataFrame): Frame to write.
+        path (str): Target directory, created if missing.
+        extra_meta (dict): Additional entries stored in meta.json.
+    """
+    os.makedirs(path, exist_ok=True)
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        spec = {'name': name, 'file': f'{i:03d}.npy'}
+        if isinstance(series.dtype, pd.CategoricalDtype) or name in STRING_COLUMNS \
+                or series.dtype == object or pd.api.types.is_string_dtype(series.dtype):
+            categorical = pd.Categorical(series)
+            spec['kind'] = 'category' if isinstance(series.dtype, pd.CategoricalDtype) else 'string'
+            spec['categories'] = [str(c) for c in categorical.categories]
+            spec['ordered'] = bool(categorical.ordered)
+            values = categorical.codes
+        elif pd.api.types.is_datetime64_any_dtype(series.dtype):
+            spec['kind'] = 'datetime'
+            values = series.to_numpy(dtype='datetime64[ns]').view(np.int64)
+        else:
+            spec['kind'] = 'numeric'
+            values = series.to_numpy()
+        spec['dtype'] = str(values.dtype)
+        np.save(os.path.join(path, spec['file']), np.ascontiguousarray(values))
+        columns.append(spec)
+    with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as meta_file:
+        json.dump({'rows': len(df), 'columns': columns, **(extra_meta or {})}, meta_file)
+
+
+def read_columns(path, mmap_mode=None, decode_strings=True):
+    """
+    Reads a directory written by write_columns back into a dataframe.
+
+    Args:
+        path (str): Directory containing meta.json and the column files.
+        mmap_mode (str): Passed to np.load; 'r' maps numeric columns read-only.
+        decode_strings (bool): Decode string columns to object values. When
+            False they stay categorical: mapped codes plus one copy of each
+            distinct string.
+
+    Returns:
+        pd.DataFrame: The decoded frame.
+    """
+    with open(os.path.join(path, 'meta.json'), encoding='utf-8') as meta_file:
+        meta = json.load(meta_file)
+    data = {}
+    for spec in meta['columns']:
+        values = np.load(os.path.join(path, spec['file']), mmap_mode=mmap_mode)
+        if spec['kind'] == 'category':
+            values = pd.Categorical.from_codes(values, spec['categories'], ordered=spec.get('ordered', False))
+        elif spec['kind'] == 'string':
+            values = pd.Categorical.from_codes(values, spec['categories'])
+            if decode_strings:
+                values = values.astype(object)
+        elif spec['kind'] == 'datetime':
+            values = values.view('datetime64[ns]')
+        data[spec['name']] = values
+    return pd.DataFrame(data, columns=[spec['name'] for spec in meta['columns']], copy=False)
+
+
+def publish_directory(path, write):
+    """
+    Atomically publishes a cache directory.
+
+    write(tmp_path) fills a temporary sibling directory that is then renamed
+    into place, so concurrent workers never see a partially written cache.
+    If another process published the same path first, its copy is kept.
+
+    Args:
+        path (str): Final cache directory.
+        write (callable): Called with the temporary directory to fill.
+    """
+    parent = os.path.dirname(path)
+    os.makedirs(parent, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=parent, prefix='.tmp-')
+    try:
+        write(tmp_path)
+        os.rename(tmp_path, path)
+    except OSError:
+        if not os.path.exists(path):
+            raise
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def cache_key(csv_path):
+    """
+    Returns a key that changes whenever the CSV's size or mtime changes.
+
+    Args:
+        csv_path (str): Path to the source CSV.
+
+    Returns:
+        str: '<stem>-<size>-<mtime_ns>'.
+    """
+    stat = os.stat(csv_path)
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return f'{stem}-{stat.st_size}-{stat.st_mtime_ns}'
+
+
+def prune(cache_dir, prefix, keep):
+    """
+    Removes stale cache directories sharing a prefix, except keep.
+
+    Args:
+        cache_dir (str): Directory holding the caches.
+        prefix (str): Name prefix of the cache family to prune.
+        keep (str): Path of the current cache directory.
+    """
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.startswith(prefix) and path != keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def load_dataset(csv_path, cache_dir=CACHE_DIR):
+    """
+    Loads the Spotify dataset, using the columnar cache when it is current.
+
+    Args:
+        csv_path (str): Path to spotify_songs.csv.
+        cache_dir (str): Directory holding the columnar caches.
+
+    Returns:
+        pd.DataFrame: Typed dataset with categorical 'playlist_genre',
+        float32 audio features and an int16 'release_year' column.
+    """
+    path = os.path.join(cache_dir, f'dataset-v{CACHE_VERSION}-{cache_key(csv_path)}')
+    if os.path.exists(path):
+        return read_columns(path)
+
+    df = read_csv(csv_path)
+    try:
+        publish_directory(path, lambda tmp_path: write_columns(df, tmp_path, {'source': os.path.abspath(csv_path)}))
+        prune(cache_dir, 'dataset-', path)
+    except OSError:
+        # A read-only filesystem only costs us the cache, not the data.
+        pass
+    return df
+
+
+if __name__ == '__main__':
+    import sys
+    load_dataset(sys.argv[1] if len(sys.argv) > 1 else './assets/spotify_songs.csv')
@@ -0,0 +1,321 @@
+'''
+    Server-side LRU cache of serialized figures, shared by the callbacks.
+
+    Entries are keyed on the callback name plus its normalized inputs and hold
+    the figure already converted to plain JSON types, so a hit skips both
+    Plotly figure construction and NumPy-aware serialization. The size comes
+    from DATAVIZ_FIGURE_CACHE_SIZE (0 disables caching).
+
+    Numeric trace arrays are sent as base64 Plotly typed arrays in the
+    narrowest dtype that holds them: the smallest integer type for integral
+    values; for fractional values, float32 when its rounding error is
+    negligible next to the span of the values (and so of any axis showing
+    them), float64 otherwise, e.g. for epoch timestamps over a short window.
+    DATAVIZ_TYPED_ARRAYS=0 sends plain JSON lists instead.
+'''
+import base64
+import functools
+import json
+import os
+import threading
+from collections import Counter, OrderedDict
+
+import numpy as np
+
+import metrics
+
+DEFAULT_SIZE = int(os.environ.get('DATAVIZ_FIGURE_CACHE_SIZE', 256))
+
+TYPED_ARRAYS = os.environ.get('DATAVIZ_TYPED_ARRAYS', '1') == '1'
+
+# Shorter arrays are left as JSON lists: encoding saves nothing and it keeps
+# small non-data lists (domains, ranges) untouched.
+MIN_TYPED_LENGTH = 16
+
+# Plotly typed-array dtypes tried, narrowest first, for integral values.
+INTEGER_DTYPES = ['u1', 'i1', 'u2', 'i2', 'u4', 'i4']
+
+# Largest float32 rounding error allowed, relative to the span of the
+# values (their magnitude when constant): orders of magnitude below one
+# pixel of an axis covering them.
+FLOAT32_TOLERANCE = 1e-6
+
+
+def _as_array(value):
+    if isinstance(value, dict):
+        if 'bdata' not in value or 'dtype' not in value:
+            return None
+        array = np.frombuffer(base64.b64decode(value['bdata']), dtype=value['dtype'])
+        if 'shape' in value:
+            array = array.reshape([int(n) for n in str(value['shape']).split(',')])
+        return array
+    if len(value) < MIN_TYPED_LENGTH:
+        return None
+    if all(isinstance(v, list) for v in value):
+        if not value or len({len(v) for v in value}) != 1:
+            return None
+        flat = [x for row in value for x in row]
+    else:
+        flat = value
+    if not all(x is None or (isinstance(x, (int, float)) and not isinstance(x, bool)) for x in flat):
+        return None
+    array = np.array([np.nan if x is None else x for x in flat], dtype=np.float64)
+    return array.reshape(len(value), -1) if flat is not value else array
+
+
+def typed_array(array):
+    """
+    Encodes a numeric array as a Plotly typed-array spec in its narrowest dtype.
+
+    Args:
+        array (np.ndarray): 1D or 2D numeric values.
+
+    Returns:
+        dict: 'dtype', base64 'bdata' and, for 2D arrays, 'shape'.
+    """
+    encoded = array.astype(np.float64)
+    if np.isfinite(array).all() and (array == np.round(array)).all():
+        for dtype in INTEGER_DTYPES:
+            info = np.iinfo(dtype)
+            if array.size == 0 or (array.min() >= info.min and array.max() <= info.max):
+                encoded = array.astype(dtype)
+                break
+    if encoded.dtype == np.float64:
+        with np.errstate(over='ignore', invalid='ignore'):
+            single = array.astype(np.float32)
+            finite = np.isfinite(array)
+            values = array[finite]
+            error = np.abs(single[finite] - values).max() if values.size else 0
+        # Constant values have no span; their magnitude sets the axis scale.
+        scale = (values.max() - values.min() or np.abs(values).max()) if values.size else 0
+        if error <= FLOAT32_TOLERANCE * scale:
+            encoded = single
+    spec = {'dtype': encoded.dtype.str.lstrip('<|='), 'bdata': base64.b64encode(encoded.tobytes()).decode('ascii')}
+    if encoded.ndim > 1:
+        spec['shape'] = ', '.join(str(n) for n in encoded.shape)
+    return spec
+
+
+def compact(node):
+    """
+    Replaces the numeric arrays of a trace, recursively, by typed arrays.
+
+    Args:
+        node (dict): A serialized trace, or an attribute dict inside one.
+
+    Returns:
+        dict: The same dict, modified in place.
+    """
+    for key, value in node.items():
+        if isinstance(value, (list, dict)):
+            array = _as_array(value)
+            if array is not None and array.dtype.kind in 'iuf' and array.ndim <= 2:
+                node[key] = typed_array(array)
+            elif isinstance(value, dict):
+                compact(value)
+    return node
+
+
+def serialize(fig):
+    """
+    Converts a figure to a dict of plain JSON types.
+
+    Args:
+        fig (go.Figure): Figure to serialize.
+
+    Returns:
+        dict: Figure dict that Dash can send without further NumPy encoding,
+        with numeric trace arrays compacted when TYPED_ARRAYS is enabled.
+    """
+    figure = json.loads(fig.to_json())
+    if TYPED_ARRAYS:
+        for trace in figure.get('data', []):
+            compact(trace)
+    return figure
+
+
+def normalize(value):
+    """
+    Normalizes a callback input so equivalent selections share a key.
+
+    Lists of labels (genre selections) are order-insensitive and are sorted;
+    other lists (slider ranges, selection coordinates) keep their order.
+    Dicts (stored selections) are normalized item by item.
+
+    Args:
+        value: A callback input value.
+
+    Returns:
+        A hashable, normalized version of value.
+    """
+    if value is None:
+        return ()
+    if isinstance(value, dict):
+        return tuple(sorted((key, normalize(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        if all(isinstance(v, str) for v in value):
+            return tuple(sorted(set(value)))
+        return tuple(normalize(v) for v in value)
+    return value
+
+
+class FigureCache:
+    """
+    Thread-safe LRU cache of serialized figures with hit/miss counters.
+    """
+
+    def __init__(self, maxsize=DEFAULT_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bumped by clear() so figures built from replaced data are not stored.
+        self.generation = 0
+        # Lookups per key, kept across clear() to order the warmer's work.
+        self.usage = Counter()
+
+    def get_or_build(self, key, build):
+        """
+        Returns the cached figure for key, building and storing it on a miss.
+
+        Args:
+            key (tuple): Cache key.
+            build (callable): Returns the go.Figure to cache.
+
+        Returns:
+            dict: The serialized figure.
+        """
+        with self._lock:
+            self._count_use(key)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.record_cache_lookup(True)
+                return self._entries[key]
+            self.misses += 1
+            generation = self.generation
+        metrics.record_cache_lookup(False)
+
+        with metrics.phase('build'):
+            fig = build()
+        with metrics.phase('serialize'):
+            figure = serialize(fig)
+        self._store(key, figure, generation)
+        return figure
+
+    def warm(self, key, build):
+        """
+        Builds and stores the figure for key unless it is cached already.
+
+        Unlike get_or_build, this counts neither a lookup nor a use of key.
+
+        Args:
+            key (tuple): Cache key.
+            build (callable): Returns the go.Figure to cache.
+
+        Returns:
+            bool: Whether a figure was built.
+        """
+        with self._lock:
+            if key in self._entries or self.maxsize <= 0:
+                return False
+            generation = self.generation
+        self._store(key, serialize(build()), generation)
+        return True
+
+    def _store(self, key, figure, generation):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = figure
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _count_use(self, key):
+        self.usage[key] += 1
+        if len(self.usage) > 16 * max(self.maxsize, 1):
+            self.usage = Counter(dict(self.usage.most_common(8 * max(self.maxsize, 1))))
+
+    def clear(self):
+        """Drops every entry, e.g. after the dataset is reloaded."""
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: size, maxsize, hits, misses, evictions and hit_rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+cache = FigureCache()
+
+# Undecorated callbacks registered with cached(), by name.
+builders = {}
+
+
+def cached(name):
+    """
+    Decorates a callback so its figure is served from the shared cache.
+
+    Args:
+        name (str): Callback name, used as the first element of the key.
+
+    Returns:
+        callable: The decorator.
+    """
+    def decorator(callback):
+        builders[name] = callback
+
+        @functools.wraps(callback)
+        def wrapper(*args):
+            return cache.get_or_build(key_for(name, *args), lambda: callback(*args))
+        return wrapper
+    return decorator
+
+
+def key_for(name, *args):
+    """
+    Returns the cache key of a cached callback called with args.
+
+    Args:
+        name (str): Name given to cached().
+        *args: Callback inputs.
+
+    Returns:
+        tuple: The cache key.
+    """
+    return (name,) + tuple(normalize(arg) for arg in args)
+
+
+def warm(name, *args):
+    """
+    Pre-builds the figure a cached callback would return for args.
+
+    Args:
+        name (str): Name given to cached().
+        *args: Callback inputs.
+
+    Returns:
+        bool: Whether a figure was built.
+    """
+    return cache.warm(key_for(name, *args), lambda: builders[name](*args))
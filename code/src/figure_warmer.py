@@ -0,0 +1,90 @@
+'''
+    Background pre-building of figure cache entries.
+
+    The interactive pages have small input spaces (a feature, a subset of
+    the six genres, a drilldown genre), so after startup their combinations
+    are built into the figure cache before anyone asks for them. The most
+    used combinations, by the cache's lookup counts, come first. The rest
+    follow in plan order, which lists selections closest to the default
+    all-genres view first. At most the cache's capacity is built, so warming
+    never evicts its own entries.
+'''
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import figure_cache
+
+# Figures are built from the in-process tables, so threads share them; the
+# GIL keeps a single thread from slowing down concurrent requests much.
+WARM_THREADS = int(os.environ.get('DATAVIZ_WARM_THREADS', 1))
+
+
+def genre_subsets(genres):
+    """
+    Lists every subset of genres, largest first.
+
+    Args:
+        genres (list): All genres.
+
+    Returns:
+        list: Genre lists, from all genres down to the empty selection.
+    """
+    return [
+        list(subset)
+        for size in range(len(genres), -1, -1)
+        for subset in itertools.combinations(genres, size)
+    ]
+
+
+def order(plan):
+    """
+    Sorts a warm-up plan by observed use, keeping plan order among ties.
+
+    Args:
+        plan (list): (cached callback name, args tuple) pairs.
+
+    Returns:
+        list: The pairs, most used first.
+    """
+    usage = figure_cache.cache.usage
+    return sorted(plan, key=lambda job: -usage.get(figure_cache.key_for(job[0], *job[1]), 0))
+
+
+def warm(plan, logger, threads=WARM_THREADS):
+    """
+    Builds the figures of a warm-up plan into the figure cache.
+
+    Stops early if the cache is cleared (the data was reloaded) meanwhile.
+
+    Args:
+        plan (list): (cached callback name, args tuple) pairs.
+        logger (logging.Logger): Receives progress messages.
+        threads (int): Number of builder threads.
+
+    Returns:
+        int: Number of figures built.
+    """
+    jobs = order(plan)[:max(figure_cache.cache.maxsize, 0)]
+    generation = figure_cache.cache.generation
+
+    def build(name, args):
+        if figure_cache.cache.generation != generation:
+            return False
+        return figure_cache.warm(name, *args)
+
+    start = time.monotonic()
+    built = 0
+    step = max(len(jobs) // 10, 1)
+    with ThreadPoolExecutor(max_workers=max(threads, 1), thread_name_prefix='figure-warmer') as pool:
+        futures = {pool.submit(build, name, args): name for name, args in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                built += future.result()
+            except Exception:
+                logger.exception('Warming %s failed', futures[future])
+            if done % step == 0 or done == len(jobs):
+                logger.info('Figure warm-up: %d/%d combinations (%d built) in %.1fs',
+                            done, len(jobs), built, time.monotonic() - start)
+    return built
@@ -0,0 +1,29 @@
+'''
+    Gunicorn configuration for preload-and-fork deployments.
+
+        gunicorn -c gunicorn.conf.py app:server
+
+    The master imports the app, loads every page's tables and indexes and
+    builds the static figures before forking, so workers start warm and
+    share that memory copy-on-write instead of each loading its own copy.
+    Tables are memory-mapped arrays with no object columns, and the
+    preloaded objects are frozen out of the garbage collector, so serving
+    requests does not dirty the shared pages. The number of workers comes
+    from WEB_CONCURRENCY or --workers.
+'''
+import gc
+import os
+
+os.environ['DATAVIZ_PRELOAD'] = '1'
+
+preload_app = True
+
+
+def when_ready(server):
+    '''Warms every page in the master, before the workers are forked.'''
+    import app
+    app.warm_all()
+    # Keep collections in the workers from touching (and copying) the
+    # pages that hold the preloaded objects.
+    gc.collect()
+    gc.freeze()
@@ -0,0 +1,188 @@
+'''
+    Hierarchical genre -> subgenre -> year aggregation cube.
+
+    Each (genre, subgenre, year) cell holds the track count and the sum and
+    sum of squares of every audio feature. Means and variances of any
+    roll-up follow from those moments, so drilldowns never touch raw rows.
+    Roll-ups over years and over subgenres are precomputed once, which makes
+    every drill step an array lookup.
+'''
+import numpy as np
+import pandas as pd
+
+FEATURES = [
+    'track_popularity', 'danceability', 'energy', 'valence', 'acousticness',
+    'speechiness', 'instrumentalness', 'liveness', 'tempo', 'loudness'
+]
+
+
+def moments_df(df, years):
+    """
+    Computes the long-format moments table the cube is built from.
+
+    Args:
+        df (pd.DataFrame): Raw Spotify data.
+        years (pd.Series): Release year of every row.
+
+    Returns:
+        pd.DataFrame: One row per (genre, subgenre, year) with 'count' and
+        'sum_<feature>' / 'sumsq_<feature>' columns.
+    """
+    values = df[FEATURES].astype(np.float64)
+    keys = [df['playlist_genre'], df['playlist_subgenre'], years.rename('year')]
+    sums = values.groupby(keys, observed=True).sum().add_prefix('sum_')
+    sumsq = (values * values).groupby(keys, observed=True).sum().add_prefix('sumsq_')
+    counts = values.groupby(keys, observed=True).size().rename('count')
+    return pd.concat([counts, sums, sumsq], axis=1).reset_index()
+
+
+class HierarchyCube:
+    """
+    Dense moments over (genre, subgenre) nodes and years.
+    """
+
+    def __init__(self, genres, nodes, node_genre, years, count, sums, sumsq):
+        self.genres = list(genres)
+        self.nodes = list(nodes)
+        self.node_genre = np.asarray(node_genre)
+        self.years = np.asarray(years)
+        self.count = count
+        self.sums = sums
+        self.sumsq = sumsq
+
+        self._genre_idx = {genre: i for i, genre in enumerate(self.genres)}
+        self._node_idx = {
+            (self.genres[g], node): i for i, (g, node) in enumerate(zip(self.node_genre, self.nodes))
+        }
+        # Subgenre names are unique across genres in the Spotify data.
+        self._subgenre_idx = {node: i for i, node in enumerate(self.nodes)}
+        self._year_idx = {int(year): i for i, year in enumerate(self.years)}
+        self._children = {
+            genre: np.flatnonzero(self.node_genre == i) for i, genre in enumerate(self.genres)
+        }
+
+        # Roll-ups: node totals over all years, genre x year and genre totals.
+        self.node_count = count.sum(axis=1)
+        self.node_sums = sums.sum(axis=1)
+        self.node_sumsq = sumsq.sum(axis=1)
+        shape = (len(self.genres),)
+        self.genre_year_count = np.zeros(shape + count.shape[1:])
+        self.genre_year_sums = np.zeros(shape + sums.shape[1:])
+        self.genre_year_sumsq = np.zeros(shape + sumsq.shape[1:])
+        np.add.at(self.genre_year_count, self.node_genre, count)
+        np.add.at(self.genre_year_sums, self.node_genre, sums)
+        np.add.at(self.genre_year_sumsq, self.node_genre, sumsq)
+        self.genre_count = self.genre_year_count.sum(axis=1)
+        self.genre_sums = self.genre_year_sums.sum(axis=1)
+        self.genre_sumsq = self.genre_year_sumsq.sum(axis=1)
+
+    @classmethod
+    def from_moments(cls, moments):
+        """
+        Densifies a table produced by moments_df.
+
+        Args:
+            moments (pd.DataFrame): Long-format moments.
+
+        Returns:
+            HierarchyCube: The cube.
+        """
+        genre = moments['playlist_genre'].astype(str).to_numpy()
+        subgenre = moments['playlist_subgenre'].astype(str).to_numpy()
+        genres = sorted(set(genre))
+        pairs = sorted(set(zip(genre, subgenre)))
+        node_idx = {pair: i for i, pair in enumerate(pairs)}
+        years, year_idx = np.unique(moments['year'].to_numpy(), return_inverse=True)
+        rows = np.array([node_idx[pair] for pair in zip(genre, subgenre)], dtype=np.int64)
+
+        count = np.zeros((len(pairs), len(years)))
+        sums = np.zeros((len(pairs), len(years), len(FEATURES)))
+        sumsq = np.zeros_like(sums)
+        count[rows, year_idx] = moments['count'].to_numpy()
+        sums[rows, year_idx] = moments[[f'sum_{f}' for f in FEATURES]].to_numpy()
+        sumsq[rows, year_idx] = moments[[f'sumsq_{f}' for f in FEATURES]].to_numpy()
+
+        genre_of = {g: i for i, g in enumerate(genres)}
+        node_genre = [genre_of[g] for g, _ in pairs]
+        return cls(genres, [s for _, s in pairs], node_genre, years, count, sums, sumsq)
+
+    def _moments(self, genre=None, subgenre=None, year=None):
+        if subgenre is not None:
+            node = self._node_idx[(genre, subgenre)] if genre is not None else self._subgenre_idx[subgenre]
+            if year is None:
+                return self.node_count[node], self.node_sums[node], self.node_sumsq[node]
+            y = self._year_idx[year]
+            return self.count[node, y], self.sums[node, y], self.sumsq[node, y]
+        if genre is not None:
+            g = self._genre_idx[genre]
+            if year is None:
+                return self.genre_count[g], self.genre_sums[g], self.genre_sumsq[g]
+            y = self._year_idx[year]
+            return self.genre_year_count[g, y], self.genre_year_sums[g, y], self.genre_year_sumsq[g, y]
+        if year is None:
+            return self.genre_count.sum(), self.genre_sums.sum(axis=0), self.genre_sumsq.sum(axis=0)
+        y = self._year_idx[year]
+        return (self.genre_year_count[:, y].sum(), self.genre_year_sums[:, y].sum(axis=0),
+                self.genre_year_sumsq[:, y].sum(axis=0))
+
+    def summary(self, genre=None, subgenre=None, year=None):
+        """
+        Returns count, mean and variance of every feature for one cell or roll-up.
+
+        Args:
+            genre (str): Genre, or None for all genres.
+            subgenre (str): Subgenre, or None for all subgenres.
+            year (int): Release year, or None for all years.
+
+        Returns:
+            pd.DataFrame: 'mean' and 'var' columns indexed by feature, with
+            the track count in the 'count' attribute of df.attrs.
+        """
+        count, sums, sumsq = self._moments(genre, subgenre, year)
+        mean, var = _mean_var(count, sums, sumsq)
+        result = pd.DataFrame({'mean': mean, 'var': var}, index=FEATURES)
+        result.attrs['count'] = int(count)
+        return result
+
+    def breakdown(self, genre=None, year=None):
+        """
+        Returns one row per child of a drill level: genres, or the subgenres of genre.
+
+        Args:
+            genre (str): Genre to drill into, or None for the genre level.
+            year (int): Restrict to one release year, or None for all years.
+
+        Returns:
+            pd.DataFrame: 'Genre' (the child label), 'count' and the mean of
+            every feature.
+        """
+        if genre is None:
+            labels = self.genres
+            if year is None:
+                count, sums = self.genre_count, self.genre_sums
+            else:
+                y = self._year_idx[year]
+                count, sums = self.genre_year_count[:, y], self.genre_year_sums[:, y]
+        else:
+            children = self._children[genre]
+            labels = [self.nodes[i] for i in children]
+            if year is None:
+                count, sums = self.node_count[children], self.node_sums[children]
+            else:
+                y = self._year_idx[year]
+                count, sums = self.count[children, y], self.sums[children, y]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / count[:, None]
+        result = pd.DataFrame(means, columns=FEATURES)
+        result.insert(0, 'count', count.astype(np.int64))
+        result.insert(0, 'Genre', labels)
+        return result[result['count'] > 0].reset_index(drop=True)
+
+
+def _mean_var(count, sums, sumsq):
+    if count == 0:
+        nan = np.full(len(FEATURES), np.nan)
+        return nan, nan
+    mean = sums / count
+    return mean, np.maximum(sumsq / count - mean * mean, 0.0)
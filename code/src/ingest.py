@@ -0,0 +1,229 @@
+'''
+    Incremental ingestion of new Spotify exports.
+
+    A delta CSV with the spotify_songs.csv schema is deduplicated on
+    track_id against every track already loaded, then folded into the
+    aggregate store without recomputing it from the full dataset: the
+    hierarchy moments (counts, sums, sums of squares) and the violin counts
+    are added to, the bar, line, stacked and radar tables are re-derived
+    from the moments, and the scatter, violin and track rows of the new
+    tracks are appended. The result is published
+    as a new store revision that running workers pick up atomically.
+
+    Deltas that parse are kept in DELTA_DIR and replayed whenever the base
+    store is rebuilt, so they survive cache wipes and STORE_VERSION bumps.
+
+        python ingest.py new_tracks.csv
+'''
+import os
+import shutil
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+import aggregate_store
+import dataset
+import preprocess
+from popularity_index import sort_frame
+from streaming import STREAM_COLUMNS
+
+try:
+    import fcntl
+except ImportError:  # Windows: ingestion is not locked across processes.
+    fcntl = None
+
+DELTA_DIR = os.environ.get(
+    'DATAVIZ_DELTA_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'deltas')
+)
+
+# Columns a delta must have: every column the derived tables read.
+REQUIRED_COLUMNS = STREAM_COLUMNS
+
+
+def _concat(old, new):
+    """Appends rows, merging the categories of categorical columns."""
+    data = {}
+    for name in old.columns:
+        if isinstance(old[name].dtype, pd.CategoricalDtype):
+            new_values = new[name] if isinstance(new[name].dtype, pd.CategoricalDtype) \
+                else new[name].astype('category')
+            data[name] = union_categoricals([old[name], new_values])
+        else:
+            data[name] = np.concatenate([old[name].to_numpy(), new[name].to_numpy()])
+    return pd.DataFrame(data)
+
+
+def read_delta(delta_csv):
+    """
+    Parses and validates a delta CSV.
+
+    Args:
+        delta_csv (str): Path to the new export.
+
+    Returns:
+        pd.DataFrame: Rows typed like dataset.read_csv.
+
+    Raises:
+        ValueError: If the file is not a CSV with the spotify_songs.csv schema.
+    """
+    columns = pd.read_csv(delta_csv, nrows=0).columns
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise ValueError(f'delta is missing columns: {", ".join(missing)}')
+    return dataset.read_csv(delta_csv)
+
+
+def merge_moments(old, new):
+    """
+    Adds two hierarchy moment tables cell by cell.
+
+    Args:
+        old (pd.DataFrame): Current moments.
+        new (pd.DataFrame): Moments of the new rows.
+
+    Returns:
+        pd.DataFrame: Merged moments, sorted like preprocess.hierarchy_df.
+    """
+    return preprocess.merge_counts([old, new], preprocess.MOMENT_KEYS, preprocess.MOMENT_KEYS[:2])
+
+
+def merge_tables(tables, delta):
+    """
+    Folds new raw rows into every derived table.
+
+    Args:
+        tables (dict): Every table of the current store revision.
+        delta (pd.DataFrame): New raw rows, typed like dataset.read_csv.
+
+    Returns:
+        tuple: (merged tables, number of rows accepted after deduplication).
+    """
+    delta = delta.drop_duplicates(subset='track_id')
+    track_ids = tables['track_ids']
+    if 'track_hash' in track_ids.columns:
+        # Stores built by streaming.py keep hashes instead of the id strings.
+        hashes = dataset.track_hashes(delta['track_id'])
+        delta = delta[~np.isin(hashes, track_ids['track_hash'].to_numpy())].reset_index(drop=True)
+        new_ids = pd.DataFrame({'track_hash': dataset.track_hashes(delta['track_id'])})
+    else:
+        known = pd.Index(track_ids['track_id'].astype(str))
+        delta = delta[~delta['track_id'].astype(str).isin(known)].reset_index(drop=True)
+        new_ids = delta[['track_id']]
+    if delta.empty:
+        return tables, 0
+
+    moments = merge_moments(tables['hierarchy_df'], preprocess.hierarchy_df(delta))
+    merged = dict(tables)
+    merged.update(preprocess.tables_from_moments(moments))
+    merged['hierarchy_df'] = moments
+    merged['scatter_df'] = sort_frame(
+        _concat(tables['scatter_df'], preprocess.scatter_chart_df(delta, sample_size=None))
+    )
+    merged['violin_df'] = _concat(tables['violin_df'], preprocess.violin_plots_df(delta))
+    merged['violin_counts'] = preprocess.merge_counts(
+        [tables['violin_counts'], preprocess.violin_counts_df(delta)],
+        preprocess.VIOLIN_COUNT_KEYS, ['feature', 'bin']
+    )
+    merged['tracks_df'] = _concat(tables['tracks_df'], preprocess.tracks_df(delta))
+    merged['track_ids'] = _concat(track_ids, new_ids)
+    return merged, len(delta)
+
+
+class _StoreLock:
+    """Serializes ingestion across processes with an advisory file lock."""
+
+    def __init__(self, base_path):
+        self.path = base_path + '.lock'
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, 'w', encoding='utf-8')
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+
+def _apply(base_path, delta_names, parsed=None):
+    pointer = aggregate_store.read_pointer(base_path)
+    pending = [name for name in delta_names if name not in pointer['deltas']]
+    if not pending:
+        return 0
+
+    cache_dir = os.path.dirname(base_path)
+    tables = aggregate_store.open_store(os.path.join(cache_dir, pointer['path']))
+    accepted = 0
+    parsed = parsed or {}
+    for name in pending:
+        delta = parsed[name] if name in parsed else dataset.read_csv(os.path.join(DELTA_DIR, name))
+        tables, rows = merge_tables(tables, delta)
+        accepted += rows
+    if accepted:
+        aggregate_store.publish_revision(base_path, tables, pointer['deltas'] + pending)
+    else:
+        # Only duplicates: the tables are unchanged, so keep the revision.
+        aggregate_store.write_pointer(base_path, pointer['path'], pointer['deltas'] + pending)
+    return accepted
+
+
+def ingest(delta_csv, csv_path, cache_dir=dataset.CACHE_DIR):
+    """
+    Ingests a delta CSV into the current store revision.
+
+    Args:
+        delta_csv (str): Path to the new export.
+        csv_path (str): Path to spotify_songs.csv (identifies the base store).
+        cache_dir (str): Directory holding the caches.
+
+    Returns:
+        int: Number of new tracks accepted.
+
+    Raises:
+        ValueError: If the delta cannot be parsed; it is not kept.
+    """
+    delta = read_delta(delta_csv)
+    os.makedirs(DELTA_DIR, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(delta_csv))[0]
+    # Names sort in arrival order for replay(); the random suffix keeps
+    # same-named uploads apart, and 'xb' never overwrites a delta.
+    name = f'{datetime.now().strftime("%Y%m%dT%H%M%S%f")}-{stem}-{uuid.uuid4().hex}.csv'
+    with open(delta_csv, 'rb') as source, open(os.path.join(DELTA_DIR, name), 'xb') as target:
+        shutil.copyfileobj(source, target)
+
+    base_path = aggregate_store.build_store(csv_path, cache_dir)
+    with _StoreLock(base_path):
+        return _apply(base_path, [name], {name: delta})
+
+
+def replay(csv_path, cache_dir=dataset.CACHE_DIR):
+    """
+    Applies every delta in DELTA_DIR that the current revision has not seen.
+
+    Args:
+        csv_path (str): Path to spotify_songs.csv.
+        cache_dir (str): Directory holding the caches.
+
+    Returns:
+        int: Number of new tracks accepted.
+    """
+    if not os.path.isdir(DELTA_DIR):
+        return 0
+    base_path = aggregate_store.build_store(csv_path, cache_dir)
+    delta_names = sorted(name for name in os.listdir(DELTA_DIR) if name.endswith('.csv'))
+    if all(name in aggregate_store.read_pointer(base_path)['deltas'] for name in delta_names):
+        return 0
+    with _StoreLock(base_path):
+        return _apply(base_path, delta_names)
+
+
+if __name__ == '__main__':
+    import sys
+    print(ingest(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else './assets/spotify_songs.csv'))
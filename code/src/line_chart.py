@@ -1,4 +1,5 @@
 import plotly.express as px
+import plotly.graph_objects as go
 from constaints import GENRE_COLORS as color_mapping
 
 def get_figure(df, feature='track_popularity'):
@@ -35,3 +36,40 @@ def get_figure(df, feature='track_popularity'):
     )
 
     return fig
+
+
+def get_cube_figure(cube, feature='track_popularity', genres=None):
+    """Generates the same chart as get_figure by slicing a preprocess.LineCube,
+    one go.Scatter per genre, without a pandas group-by."""
+
+    label = feature.replace('_', ' ').title()
+    feature_idx = cube.features.index(feature)
+    selected = set(cube.genres if genres is None else genres)
+
+    fig = go.Figure([
+        go.Scatter(
+            x=cube.years,
+            y=cube.values[:, genre_idx, feature_idx],
+            name=genre,
+            legendgroup=genre,
+            mode='lines+markers',
+            connectgaps=True,
+            line=dict(shape='spline', color=color_mapping.get(genre)),
+            hovertemplate=f'Genre={genre}<br>Release Year=%{{x}}<br>{label}=%{{y}}<extra></extra>'
+        )
+        for genre_idx, genre in enumerate(cube.genres) if genre in selected
+    ])
+
+    fig.update_layout(
+        font=dict(family="Segoe UI, Lato, Arial", size=16, color="#222"),
+        title=dict(text=f"{label} Evolution Over Time by Genre", x=0.5, font=dict(size=22)),
+        legend=dict(title='Genre', font=dict(size=14)),
+        xaxis=dict(title='Year', tickfont=dict(size=14)),
+        yaxis=dict(title=label, tickfont=dict(size=14)),
+        hovermode='x unified',
+        plot_bgcolor="#f8f9fa",
+        paper_bgcolor="white",
+        margin=dict(l=60, r=30, t=60, b=60)
+    )
+
+    return fig
@@ -0,0 +1,88 @@
+'''
+    Sorted popularity index over the scatter table.
+
+    Rows are partitioned by genre and sorted by popularity within each genre,
+    so a genre selection plus a [lo, hi] popularity range resolves to two
+    binary searches per genre and a set of contiguous slices.
+'''
+import numpy as np
+
+
+def sort_frame(df):
+    """
+    Orders rows by genre, then popularity, as PopularityIndex expects.
+
+    Args:
+        df (pd.DataFrame): Frame with categorical 'playlist_genre' and 'track_popularity'.
+
+    Returns:
+        pd.DataFrame: The sorted frame with a fresh RangeIndex.
+    """
+    codes = df['playlist_genre'].cat.codes.to_numpy()
+    order = np.lexsort((df['track_popularity'].to_numpy(), codes))
+    return df.take(order).reset_index(drop=True)
+
+
+class PopularityIndex:
+    """
+    Answers genre + popularity-range queries with binary search.
+
+    The frame must already be ordered by sort_frame, and is indexed as is:
+    query results keep its row labels, which callers resolve against the
+    same frame (e.g. the scatter's customdata against scatter_df).
+    """
+
+    def __init__(self, df):
+        codes = df['playlist_genre'].cat.codes.to_numpy()
+        popularity = df['track_popularity'].to_numpy()
+        key = codes.astype(np.int64) * 1024 + popularity
+        if len(key) > 1 and (np.diff(key) < 0).any():
+            raise ValueError('PopularityIndex needs a frame ordered by sort_frame')
+
+        self.df = df
+        self.popularity = popularity
+        categories = df['playlist_genre'].cat.categories
+        starts = np.searchsorted(codes, np.arange(len(categories) + 1), side='left')
+        self.partitions = {
+            str(genre): (starts[i], starts[i + 1]) for i, genre in enumerate(categories)
+        }
+
+    def positions(self, genres, low, high):
+        """
+        Returns the row positions matching the query.
+
+        Args:
+            genres (list): Selected genres.
+            low (int): Lowest popularity, inclusive.
+            high (int): Highest popularity, inclusive.
+
+        Returns:
+            np.ndarray: Row positions into self.df, grouped by genre.
+        """
+        slices = []
+        for genre in genres or []:
+            if genre not in self.partitions:
+                continue
+            start, stop = self.partitions[genre]
+            values = self.popularity[start:stop]
+            first = start + np.searchsorted(values, low, side='left')
+            last = start + np.searchsorted(values, high, side='right')
+            if last > first:
+                slices.append(np.arange(first, last))
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(slices)
+
+    def query(self, genres, low, high):
+        """
+        Returns the rows of the selected genres within [low, high] popularity.
+
+        Args:
+            genres (list): Selected genres.
+            low (int): Lowest popularity, inclusive.
+            high (int): Highest popularity, inclusive.
+
+        Returns:
+            pd.DataFrame: Matching rows.
+        """
+        return self.df.take(self.positions(genres, low, high))
@@ -1,6 +1,26 @@
+from collections import namedtuple
+
 import pandas as pd
 import numpy as np
 
+import dataset
+import hierarchy_cube
+
+LINE_FEATURES = ['track_popularity', 'danceability', 'energy', 'valence', 'acousticness', 'speechiness']
+
+RADAR_FEATURES = ['energy', 'valence', 'danceability', 'acousticness', 'speechiness']
+
+# Dense years x genres x features array of yearly means, NaN where a genre
+# has no release in a year.
+LineCube = namedtuple('LineCube', ['years', 'genres', 'features', 'values'])
+
+# One resolution of the stacked area chart: datetime64 x positions, dense
+# periods x genres song counts and their cumulative sums across genres.
+TimeLevel = namedtuple('TimeLevel', ['name', 'x', 'counts', 'stacks'])
+
+# Every resolution of the stacked area chart, finest first.
+TimePyramid = namedtuple('TimePyramid', ['genres', 'levels'])
+
 def bar_chart_df(df):
     """
     Computes average popularity per playlist genre from a raw dataframe.
@@ -12,7 +32,7 @@ def bar_chart_df(df):
         pd.DataFrame: DataFrame with 'Genre' and 'Average Popularity' columns.
     """
     return (
-        df.groupby('playlist_genre')['track_popularity']
+        df.groupby('playlist_genre', observed=True)['track_popularity']
         .mean()
         .reset_index()
         .rename(columns={'playlist_genre': 'Genre', 'track_popularity': 'Average Popularity'})
@@ -20,20 +40,140 @@ def bar_chart_df(df):
     )
 
 
+def release_years(df):
+    """
+    Returns the int16 release year of every track.
+
+    Reuses the 'release_year' column produced by dataset.read_csv when
+    present, so release dates are parsed once; the caller's frame is never
+    modified.
+
+    Args:
+        df (pd.DataFrame): Raw Spotify data.
+
+    Returns:
+        pd.Series: int16 years, dataset.MISSING_YEAR where unknown.
+    """
+    if 'release_year' in df.columns:
+        return df['release_year']
+    return dataset.parse_release_years(df['track_album_release_date'])
+
+
 def line_chart_df(df):
     """
     Prepares data for temporal analysis (V1).
     Groups data by year and genre for time series analysis.
     """
-   
-    df['release_year'] = pd.to_datetime(df['track_album_release_date'], errors='coerce').dt.year
-    df = df.dropna(subset=['release_year'])
-    
-    
-    features = ['track_popularity', 'danceability', 'energy', 'valence', 'acousticness', 'speechiness']
-    
-    result = df.groupby(['release_year', 'playlist_genre'])[features].mean().reset_index()
-    return result
+    features = LINE_FEATURES
+    years = release_years(df).rename('release_year')
+
+    result = df[features].groupby([years, df['playlist_genre']], observed=True).mean().reset_index()
+    return result[result['release_year'] != dataset.MISSING_YEAR].reset_index(drop=True)
+
+
+def hierarchy_df(df):
+    """
+    Computes genre -> subgenre -> year moments for the drilldown cube.
+
+    Args:
+        df (pd.DataFrame): Raw Spotify data.
+
+    Returns:
+        pd.DataFrame: Long-format moments, see hierarchy_cube.moments_df.
+    """
+    return hierarchy_cube.moments_df(df, release_years(df))
+
+
+# Keys of the additive tables: hierarchy moments and violin counts.
+MOMENT_KEYS = ['playlist_genre', 'playlist_subgenre', 'year']
+VIOLIN_COUNT_KEYS = ['feature', 'bin_index', 'bin', 'track_popularity']
+
+
+def merge_counts(frames, keys, categorical):
+    """
+    Adds tables of additive statistics (counts, sums) key by key.
+
+    Args:
+        frames (list): Tables with the same columns.
+        keys (list): Key columns.
+        categorical (list): Key columns stored as categoricals.
+
+    Returns:
+        pd.DataFrame: One row per key, sorted by key.
+    """
+    as_str = {key: str for key in categorical}
+    both = pd.concat([frame.astype(as_str) for frame in frames], ignore_index=True)
+    merged = both.groupby(keys, sort=True).sum().reset_index()
+    return merged.astype({key: 'category' for key in categorical})
+
+
+def _moment_means(moments, keys, features):
+    grouped = moments.groupby(keys, observed=True)[['count'] + [f'sum_{f}' for f in features]].sum()
+    means = pd.DataFrame(
+        {f: grouped[f'sum_{f}'] / grouped['count'] for f in features},
+        index=grouped.index
+    )
+    return means.reset_index()
+
+
+def tables_from_moments(moments):
+    """
+    Re-derives the mergeable tables from the hierarchy moments.
+
+    Counts and sums are additive, so after new rows are folded into the
+    moments, the bar, line, stacked area and radar tables follow without
+    touching raw rows. Results match bar_chart_df, line_chart_df,
+    area_chart_df and radar_chart_df.
+
+    Args:
+        moments (pd.DataFrame): Output of hierarchy_df, possibly merged.
+
+    Returns:
+        dict: 'bar_df', 'line_chart_df', 'stacked_df' and 'radar_df'.
+    """
+    dated = moments[moments['year'] != dataset.MISSING_YEAR]
+
+    bar_df = (
+        _moment_means(moments, ['playlist_genre'], ['track_popularity'])
+        .rename(columns={'playlist_genre': 'Genre', 'track_popularity': 'Average Popularity'})
+        .sort_values(by='Average Popularity', ascending=False)
+    )
+
+    line_df = _moment_means(dated, ['year', 'playlist_genre'], LINE_FEATURES)
+    line_df = line_df.rename(columns={'year': 'release_year'})
+
+    stacked_df = (
+        dated.groupby(['year', 'playlist_genre'], observed=True)['count'].sum()
+        .astype(np.int64)
+        .reset_index()
+        .rename(columns={'playlist_genre': 'Genre'})
+    )
+    stacked_df['year'] = pd.to_datetime(stacked_df['year'].astype(str), format='%Y')
+
+    radar_df = (
+        _moment_means(moments, ['playlist_genre'], RADAR_FEATURES)
+        .rename(columns={'playlist_genre': 'Genre'})
+    )
+
+    return {'bar_df': bar_df, 'line_chart_df': line_df, 'stacked_df': stacked_df, 'radar_df': radar_df}
+
+
+def line_chart_cube(line_df):
+    """
+    Densifies the output of line_chart_df into a LineCube.
+
+    Args:
+        line_df (pd.DataFrame): Output of line_chart_df.
+
+    Returns:
+        LineCube: float32 values of shape (years, genres, features).
+    """
+    years, year_idx = np.unique(line_df['release_year'].to_numpy(), return_inverse=True)
+    genres = line_df['playlist_genre'].astype('category').cat
+    genre_idx = genres.codes.to_numpy()
+    values = np.full((len(years), len(genres.categories), len(LINE_FEATURES)), np.nan, dtype=np.float32)
+    values[year_idx, genre_idx] = line_df[LINE_FEATURES].to_numpy(dtype=np.float32)
+    return LineCube(years, [str(genre) for genre in genres.categories], list(LINE_FEATURES), values)
 
 
 def area_chart_df(df):
@@ -44,20 +184,57 @@ def area_chart_df(df):
     Returns:
         pd.DataFrame: DataFrame with 'year', 'Genre', and 'count' columns.
     """
-    df_copy = df.copy()
-    df_copy['year'] = df_copy['track_album_release_date'].str[:4].astype(int)
-    df_copy['year'] = pd.to_datetime(df_copy['track_album_release_date'].str[:4], format='%Y')
-    
+    years = release_years(df).rename('year')
 
     area_df = (
-        df_copy.groupby(['year', 'playlist_genre'])
+        df.groupby([years, df['playlist_genre']], observed=True)
         .size()
         .reset_index(name='count')
         .rename(columns={'playlist_genre': 'Genre'})
     )
+    area_df = area_df[area_df['year'] != dataset.MISSING_YEAR].reset_index(drop=True)
+    area_df['year'] = pd.to_datetime(area_df['year'].astype(str), format='%Y')
     
     return area_df
 
+
+def stacked_pyramid(stacked_df):
+    """
+    Densifies the output of area_chart_df into a year and a decade level.
+
+    Decade counts are averaged over the decade's years with releases, so
+    both levels are songs per year on the same axis, and each decade is
+    placed at the mean of those years.
+
+    Args:
+        stacked_df (pd.DataFrame): Output of area_chart_df.
+
+    Returns:
+        TimePyramid: Genres in the chart's trace order and the 'year' and
+        'decade' TimeLevels.
+    """
+    dates = pd.to_datetime(stacked_df['year'])
+    years, year_idx = np.unique(dates.dt.year.to_numpy(), return_inverse=True)
+    genres = stacked_df['Genre'].astype('category').cat
+    counts = np.zeros((len(years), len(genres.categories)))
+    counts[year_idx, genres.codes.to_numpy()] = stacked_df['count'].to_numpy()
+    year_x = pd.to_datetime(years.astype(str), format='%Y').to_numpy(dtype='datetime64[ns]')
+
+    decades, decade_idx = np.unique(years // 10 * 10, return_inverse=True)
+    n_years = np.bincount(decade_idx, minlength=len(decades))
+    decade_counts = np.zeros((len(decades), counts.shape[1]))
+    np.add.at(decade_counts, decade_idx, counts)
+    decade_counts /= np.maximum(n_years, 1)[:, None]
+    year_ns = year_x.view(np.int64).astype(np.float64)
+    decade_ns = np.bincount(decade_idx, weights=year_ns, minlength=len(decades)) / np.maximum(n_years, 1)
+    decade_x = decade_ns.astype(np.int64).view('datetime64[ns]')
+
+    levels = [
+        TimeLevel('year', year_x, counts, counts.cumsum(axis=1)),
+        TimeLevel('decade', decade_x, decade_counts, decade_counts.cumsum(axis=1)),
+    ]
+    return TimePyramid([str(genre) for genre in genres.categories], levels)
+
 def radar_chart_df(df):
     """
     Computes average audio features per playlist genre for radar chart visualization.
@@ -66,9 +243,9 @@ def radar_chart_df(df):
     Returns:
         pd.DataFrame: DataFrame with 'Genre' and average audio feature columns.
     """
-    audio_features = ['energy', 'valence', 'danceability', 'acousticness', 'speechiness']
+    audio_features = RADAR_FEATURES
     radar_df = (
-        df.groupby('playlist_genre')[audio_features]
+        df.groupby('playlist_genre', observed=True)[audio_features]
         .mean()
         .reset_index()
         .rename(columns={'playlist_genre': 'Genre'})
@@ -113,50 +290,129 @@ def radar_chart_df(df):
 #     return scatter_df.reset_index(drop=True)
 
 
+# Bin definitions for the violin plots: output column -> (source column,
+# right-inclusive bin edges, labels). Duration edges are in milliseconds so
+# the source column never needs rescaling; mode is 0/1 and uses unit bins.
+VIOLIN_BINS = {
+    'danceability_bin': ('danceability', [0, 0.33, 0.66, 1.0], ['Low', 'Medium', 'High']),
+    'acousticness_bin': ('acousticness', [0, 0.5, 1.0], ['Non-Acoustic', 'Acoustic']),
+    'instrumentalness_bin': ('instrumentalness', [0, 0.5, 1.0], ['Non-Instrumental', 'Instrumental']),
+    'mode_bin': ('mode', [-1, 0, 1], ['Minor', 'Major']),
+    'duration_bin': ('duration_ms', [0, 180000, 240000, float('inf')],
+                     ['Short (< 3 min)', 'Medium (3-4 min)', 'Long (> 4 min)']),
+    'tempo_bin': ('tempo', [0, 90, 120, float('inf')],
+                  ['Slow (< 90 BPM)', 'Medium (90-120 BPM)', 'Fast (> 120 BPM)']),
+}
+
+
+def bin_codes(values, edges):
+    """
+    Computes integer bin codes with the same semantics as pd.cut(right=True).
+
+    Args:
+        values (np.ndarray): Values to bin.
+        edges (list): Increasing bin edges.
+
+    Returns:
+        np.ndarray: int8 codes, -1 for values outside (edges[0], edges[-1]] or NaN.
+    """
+    # Compare in the values' own precision: float32(0.33) > 0.33 in float64,
+    # which would move a value sitting on an edge into the next bin.
+    values = np.asarray(values)
+    edges = np.asarray(edges, dtype=values.dtype if values.dtype.kind == 'f' else np.float64)
+    codes = np.searchsorted(edges, values, side='left') - 1
+    codes[(codes < 0) | (codes >= len(edges) - 1)] = -1
+    return codes.astype(np.int8)
+
+
 def violin_plots_df(df):
     """
     Prepares data for violin plots (V5).
-    Creates categorical bins for audio features.
+    Bins the audio features in one pass over only the columns involved.
+
+    Args:
+        df (pd.DataFrame): Raw Spotify data.
+
+    Returns:
+        pd.DataFrame: 'track_popularity' plus one ordered categorical column
+        per entry of VIOLIN_BINS.
     """
-    df_clean = df.copy()
-    
-    df_clean['danceability_bin'] = pd.cut(df_clean['danceability'], 
-                                         bins=[0, 0.33, 0.66, 1.0], 
-                                         labels=['Low', 'Medium', 'High'])
-    
-    df_clean['acousticness_bin'] = pd.cut(df_clean['acousticness'], 
-                                         bins=[0, 0.5, 1.0], 
-                                         labels=['Non-Acoustic', 'Acoustic'])
-    
-    df_clean['instrumentalness_bin'] = pd.cut(df_clean['instrumentalness'], 
-                                             bins=[0, 0.5, 1.0], 
-                                             labels=['Non-Instrumental', 'Instrumental'])
-    
-    df_clean['mode_bin'] = df_clean['mode'].map({0: 'Minor', 1: 'Major'})
-    
-   
-    df_clean['duration_minutes'] = df_clean['duration_ms'] / 60000
-    df_clean['duration_bin'] = pd.cut(df_clean['duration_minutes'], 
-                                     bins=[0, 3, 4, float('inf')], 
-                                     labels=['Short (< 3 min)', 'Medium (3-4 min)', 'Long (> 4 min)'])
-    
-    df_clean['tempo_bin'] = pd.cut(df_clean['tempo'], 
-                                  bins=[0, 90, 120, float('inf')], 
-                                  labels=['Slow (< 90 BPM)', 'Medium (90-120 BPM)', 'Fast (> 120 BPM)'])
-    
-    return df_clean
+    data = {'track_popularity': df['track_popularity'].to_numpy()}
+    for bin_col, (source_col, edges, labels) in VIOLIN_BINS.items():
+        codes = bin_codes(df[source_col].to_numpy(), edges)
+        data[bin_col] = pd.Categorical.from_codes(codes, labels, ordered=True)
+    return pd.DataFrame(data)
+
+
+def violin_counts_df(df):
+    """
+    Counts tracks per violin bin and popularity value.
+
+    The counts are additive, so the tables of separate chunks or deltas
+    merge with merge_counts, and summary-mode violins are drawn from them
+    without per-track rows (see violin_plots.get_counts_figure).
+
+    Args:
+        df (pd.DataFrame): Raw Spotify data.
+
+    Returns:
+        pd.DataFrame: 'feature' (VIOLIN_BINS column), 'bin_index', 'bin'
+        (label), 'track_popularity' and 'count', for non-zero counts.
+    """
+    popularity = df['track_popularity'].to_numpy().astype(np.int64)
+    lo = int(popularity.min()) if len(popularity) else 0
+    width = int(popularity.max()) - lo + 1 if len(popularity) else 1
+    frames = []
+    for bin_col, (source_col, edges, labels) in VIOLIN_BINS.items():
+        codes = bin_codes(df[source_col].to_numpy(), edges)
+        valid = codes >= 0
+        counts = np.bincount(codes[valid].astype(np.int64) * width + popularity[valid] - lo,
+                             minlength=len(labels) * width)
+        nonzero = np.flatnonzero(counts)
+        bin_index = nonzero // width
+        frames.append(pd.DataFrame({
+            'feature': bin_col,
+            'bin_index': bin_index.astype(np.int8),
+            'bin': np.asarray(labels)[bin_index],
+            'track_popularity': (nonzero % width + lo).astype(np.int16),
+            'count': counts[nonzero],
+        }))
+    return pd.concat(frames, ignore_index=True).astype({'feature': 'category', 'bin': 'category'})
+
+
+# Filter dimensions of tracks_df besides the violin bins.
+TRACK_COLUMNS = ['playlist_genre', 'playlist_subgenre', 'mode', 'key', 'track_popularity', 'energy', 'valence']
+
+
+def tracks_df(df):
+    """
+    Builds the per-track filter table behind the bitmap index.
+
+    Args:
+        df (pd.DataFrame): Raw Spotify data.
+
+    Returns:
+        pd.DataFrame: One row per track with the TRACK_COLUMNS plus the
+        categorical VIOLIN_BINS columns.
+    """
+    tracks = df[TRACK_COLUMNS].reset_index(drop=True)
+    bins = violin_plots_df(df).drop(columns='track_popularity')
+    return pd.concat([tracks, bins], axis=1)
 
 
-def scatter_chart_df(df):
+def scatter_chart_df(df, sample_size=10000):
     """
     Prepares data for Energy vs Valence scatter plot with popularity and danceability.
     Args:
         df (pd.DataFrame): Raw Spotify data containing energy, valence, track_popularity, danceability, and track info.
+        sample_size (int): Maximum number of rows kept, by random sampling; None keeps every row.
     Returns:
-        pd.DataFrame: DataFrame with energy, valence, track_popularity, danceability, playlist_genre, and track information.
+        pd.DataFrame: DataFrame with energy, valence, track_popularity, danceability, the other
+        similarity.SIMILARITY_FEATURES, playlist_genre, playlist_subgenre, and track information.
     """
     scatter_df = df[['energy', 'valence', 'track_popularity', 'danceability',
-                    'track_name', 'track_artist', 'playlist_genre']].dropna()
+                    'acousticness', 'speechiness', 'instrumentalness', 'tempo',
+                    'track_name', 'track_artist', 'playlist_genre', 'playlist_subgenre']].dropna()
     
     scatter_df = scatter_df[
         (scatter_df['track_popularity'] >= 0) &
@@ -169,7 +425,7 @@ def scatter_chart_df(df):
             (scatter_df[feature] <= 1)
         ]
     
-    if len(scatter_df) > 10000:
-        scatter_df = scatter_df.sample(n=10000, random_state=42)
+    if sample_size is not None and len(scatter_df) > sample_size:
+        scatter_df = scatter_df.sample(n=sample_size, random_state=42)
     
     return scatter_df.reset_index(drop=True)
@@ -1,31 +1,55 @@
 import plotly.graph_objects as go
 import numpy as np
+from plotly.colors import qualitative
 from constaints import GENRE_COLORS as colors
 
-def get_figure(df, selected_genres=None):
-    
-    """Generates a radar chart showing the average audio feature profile by genre."""
-    
+FEATURES = ['energy', 'valence', 'danceability', 'acousticness', 'speechiness']
+
+# Angular positions shared by every polygon, closed back onto the first feature.
+THETA = FEATURES + FEATURES[:1]
+
+
+def closed_polygons(values):
+    """
+    Closes each row of a genres x features array onto its first feature.
+
+    Args:
+        values (np.ndarray): Array of shape (genres, features).
+
+    Returns:
+        np.ndarray: Array of shape (genres, features + 1).
+    """
+    return np.concatenate([values, values[:, :1]], axis=1)
+
+
+def get_figure(df, selected_genres=None, parent_genre=None):
     
-    features = ['energy', 'valence', 'danceability', 'acousticness', 'speechiness']
+    """Generates a radar chart showing the average audio feature profile by genre.
+
+    With parent_genre set, the rows of df are subgenres of that genre: they get
+    distinct palette colors and are tagged with the parent genre in trace.meta
+    so genre filters still apply to them."""
     
-    fig = go.Figure()
+    genres = [str(genre) for genre in df['Genre']]
+    polygons = closed_polygons(df[FEATURES].to_numpy(dtype=np.float64))
 
-    for _, row in df.iterrows():
-        genre = row['Genre'].lower()
-        values = [row[feature] for feature in features]
-        values += values[:1]
-        feature_labels = features + [features[0]]
+    fig = go.Figure()
 
+    for i, (genre, r) in enumerate(zip(genres, polygons)):
+        if parent_genre is None:
+            color = colors.get(genre.lower(), '#17becf')
+        else:
+            color = qualitative.Plotly[i % len(qualitative.Plotly)]
         fig.add_trace(go.Scatterpolar(
-            r=values,
-            theta=feature_labels,
+            r=r,
+            theta=THETA,
             fill='toself',
-            name=row['Genre'].title(),
-            line=dict(color=colors.get(genre, '#17becf'), width=3),
-            fillcolor=colors.get(genre, '#17becf'),
+            name=genre.title(),
+            meta=parent_genre or genre,
+            line=dict(color=color, width=3),
+            fillcolor=color,
             opacity=0.3,
-            marker=dict(size=8, color=colors.get(genre, '#17becf')),
+            marker=dict(size=8, color=color),
             hovertemplate='%{fullData.name}<br>%{theta}: %{r:.2f}<extra></extra>'
         ))
 
@@ -63,7 +87,8 @@ def get_figure(df, selected_genres=None):
             borderwidth=1
         ),
         title=dict(
-            text="Average Audio Feature Profile by Genre (Radar Chart)",
+            text="Average Audio Feature Profile by Genre (Radar Chart)" if parent_genre is None
+            else f"Average Audio Feature Profile by Subgenre of {parent_genre.title()} (Radar Chart)",
             x=0.5,
             font=dict(size=20, family="Segoe UI", color='#333333')
         ),
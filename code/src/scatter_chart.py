@@ -1,44 +1,74 @@
+import numpy as np
 import plotly.express as px
+import plotly.graph_objects as go
 from constaints import GENRE_COLORS
 
 
-def get_figure(df):
+def get_figure(df, lazy_hover=False):
     """
     Generates a scatter plot showing Energy vs Valence with genre color and danceability size.
+
+    Args:
+        df (pd.DataFrame): Scatter data.
+        lazy_hover (bool): Leave track names and artists out of the figure.
+            Each point then carries its df index label in customdata[0] so
+            a hover callback can look the track up on demand.
     """
+    labels = {
+        'playlist_genre': 'Genre',
+        'track_popularity': 'Popularity',
+        'danceability': 'Danceability'
+    }
 
-    fig = px.scatter(
-        df,
-        x='energy',
-        y='valence',
-        color='playlist_genre',
-        size='danceability',
-        color_discrete_map=GENRE_COLORS,
-        hover_name='track_name',
-        hover_data={
-            'track_artist': True,
-            'energy': ':.2f',
-            'valence': ':.2f',
-            'track_popularity': True,
-            'danceability': ':.2f'
-        },
-        labels={
-            'playlist_genre': 'Genre',
-            'track_popularity': 'Popularity',
-            'danceability': 'Danceability'
-        },
-        size_max=15,
-        opacity=0.7
-    )
+    if lazy_hover:
+        fig = px.scatter(
+            df.assign(row=df.index.to_numpy()),
+            x='energy',
+            y='valence',
+            color='playlist_genre',
+            size='danceability',
+            color_discrete_map=GENRE_COLORS,
+            custom_data=['row', 'track_popularity'],
+            labels=labels,
+            size_max=15,
+            opacity=0.7
+        )
 
-    fig.update_traces(
-        hovertemplate='<b>%{hovertext}</b><br>' +
-                      'Artist: %{customdata[0]}<br>' +
-                      'Energy: %{x:.2f}<br>' +
-                      'Valence: %{y:.2f}<br>' +
-                      'Popularity: %{customdata[1]}<br>' +
-                      '<extra></extra>'
-    )
+        fig.update_traces(
+            hovertemplate='Energy: %{x:.2f}<br>' +
+                          'Valence: %{y:.2f}<br>' +
+                          'Popularity: %{customdata[1]}<br>' +
+                          '<extra></extra>'
+        )
+    else:
+        fig = px.scatter(
+            df,
+            x='energy',
+            y='valence',
+            color='playlist_genre',
+            size='danceability',
+            color_discrete_map=GENRE_COLORS,
+            hover_name='track_name',
+            hover_data={
+                'track_artist': True,
+                'energy': ':.2f',
+                'valence': ':.2f',
+                'track_popularity': True,
+                'danceability': ':.2f'
+            },
+            labels=labels,
+            size_max=15,
+            opacity=0.7
+        )
+
+        fig.update_traces(
+            hovertemplate='<b>%{hovertext}</b><br>' +
+                          'Artist: %{customdata[0]}<br>' +
+                          'Energy: %{x:.2f}<br>' +
+                          'Valence: %{y:.2f}<br>' +
+                          'Popularity: %{customdata[1]}<br>' +
+                          '<extra></extra>'
+        )
 
     fig.update_layout(
         title=dict(
@@ -53,7 +83,119 @@ def get_figure(df):
         font=dict(family="Segoe UI", size=14, color="#333"),
         height=600,
         margin=dict(l=60, r=100, t=80, b=60),
-        hovermode='closest'
+        hovermode='closest',
+        dragmode='lasso'
+    )
+
+    return fig
+
+
+DENSITY_BINS = 50
+
+
+def density_grid(df, bins=DENSITY_BINS):
+    """
+    Counts tracks per genre on a regular energy x valence grid.
+
+    All genres are histogrammed in a single vectorized bincount.
+
+    Args:
+        df (pd.DataFrame): Scatter data with 'energy', 'valence' and categorical 'playlist_genre'.
+        bins (int): Number of bins per axis over [0, 1].
+
+    Returns:
+        tuple: (genres, counts) where counts has shape (len(genres), bins, bins)
+        indexed as [genre, valence bin, energy bin].
+    """
+    genres = df['playlist_genre'].astype('category').cat
+    codes = genres.codes.to_numpy().astype(np.int64)
+    x = np.clip((df['energy'].to_numpy() * bins).astype(np.int64), 0, bins - 1)
+    y = np.clip((df['valence'].to_numpy() * bins).astype(np.int64), 0, bins - 1)
+    flat = (codes * bins + y) * bins + x
+    counts = np.bincount(flat[codes >= 0], minlength=len(genres.categories) * bins * bins)
+    return list(genres.categories), counts.reshape(len(genres.categories), bins, bins)
+
+
+def get_density_figure(df, bins=DENSITY_BINS):
+    """
+    Generates an Energy vs Valence density view whose size does not depend on the row count.
+
+    A heatmap shows the total number of tracks per cell and one contour layer
+    per genre outlines where that genre concentrates.
+    """
+    genres, counts = density_grid(df, bins)
+    centers = (np.arange(bins) + 0.5) / bins
+    total = counts.sum(axis=0)
+
+    fig = go.Figure(go.Heatmap(
+        x=centers,
+        y=centers,
+        z=np.where(total > 0, total, np.nan),
+        colorscale='Greys',
+        colorbar=dict(title='Tracks', x=1.12),
+        hovertemplate='Energy: %{x:.2f}<br>Valence: %{y:.2f}<br>Tracks: %{z}<extra></extra>'
+    ))
+
+    # Heatmaps and contours are not selectable, so an invisible marker per
+    # cell lets box and lasso selections report their region.
+    grid_x, grid_y = np.meshgrid(centers, centers)
+    fig.add_trace(go.Scatter(
+        x=grid_x.ravel(),
+        y=grid_y.ravel(),
+        mode='markers',
+        marker=dict(opacity=0),
+        showlegend=False,
+        hoverinfo='skip'
+    ))
+
+    for genre, genre_counts in zip(genres, counts):
+        if not genre_counts.any():
+            continue
+        color = GENRE_COLORS.get(str(genre), '#17becf')
+        fig.add_trace(go.Contour(
+            x=centers,
+            y=centers,
+            z=genre_counts,
+            name=str(genre),
+            showlegend=True,
+            showscale=False,
+            ncontours=4,
+            contours_coloring='lines',
+            colorscale=[[0, color], [1, color]],
+            line=dict(width=2),
+            hoverinfo='skip'
+        ))
+
+    fig.update_layout(
+        title=dict(
+            text="V4: Energy vs Valence (Density, Color: Genre)",
+            x=0.5,
+            font=dict(size=18, family="Segoe UI", color='#333333')
+        ),
+        xaxis=dict(title="Energy", range=[0, 1], showgrid=True, gridcolor='lightgray'),
+        yaxis=dict(title="Valence", range=[0, 1], showgrid=True, gridcolor='lightgray'),
+        legend=dict(title='Genre'),
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(family="Segoe UI", size=14, color="#333"),
+        height=600,
+        margin=dict(l=60, r=100, t=80, b=60),
+        hovermode='closest',
+        dragmode='lasso'
     )
 
     return fig
+
+
+def get_auto_figure(df, point_limit, lazy_hover=False):
+    """
+    Draws individual points for small selections and the density view otherwise.
+
+    Args:
+        df (pd.DataFrame): Filtered scatter data.
+        point_limit (int): Largest selection still drawn point by point.
+        lazy_hover (bool): See get_figure.
+    """
+    if len(df) <= point_limit:
+        return get_figure(df, lazy_hover)
+    return get_density_figure(df)
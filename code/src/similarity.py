@@ -0,0 +1,64 @@
+'''
+    Nearest-neighbour search over normalized audio-feature vectors.
+
+    Every track becomes a float32 vector of its SIMILARITY_FEATURES, each
+    standardized to zero mean and unit variance so tempo does not outweigh
+    the [0, 1] features. A query scans the matrix block by block with one
+    matrix-vector product per block (|x - q|^2 = |x|^2 - 2 x.q + |q|^2, with
+    |x|^2 precomputed) and keeps the k best of each block, so memory stays
+    bounded by the block size whatever the number of tracks.
+'''
+import numpy as np
+
+SIMILARITY_FEATURES = [
+    'danceability', 'energy', 'valence', 'acousticness', 'speechiness', 'instrumentalness', 'tempo'
+]
+
+BLOCK_SIZE = 65536
+
+
+class SimilarityIndex:
+    """
+    Brute-force k-nearest-neighbour index over standardized features.
+    """
+
+    def __init__(self, df, features=None, block_size=BLOCK_SIZE):
+        features = SIMILARITY_FEATURES if features is None else features
+        values = np.column_stack([df[feature].to_numpy(dtype=np.float64) for feature in features])
+        mean = values.mean(axis=0) if len(values) else np.zeros(len(features))
+        std = values.std(axis=0) if len(values) else np.ones(len(features))
+        self.features = list(features)
+        self.block_size = block_size
+        self.vectors = ((values - mean) / np.where(std > 0, std, 1)).astype(np.float32)
+        self.norms = np.einsum('ij,ij->i', self.vectors, self.vectors)
+
+    def neighbours(self, position, k=10):
+        """
+        Returns the tracks closest to one track, itself excluded.
+
+        Args:
+            position (int): Row position of the query track.
+            k (int): Number of neighbours.
+
+        Returns:
+            tuple: (positions, distances) of the k nearest tracks, nearest
+            first; distances are Euclidean in standardized units.
+        """
+        query = self.vectors[position]
+        k = min(k, len(self.vectors) - 1)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        candidates, scores = [], []
+        for start in range(0, len(self.vectors), self.block_size):
+            stop = min(start + self.block_size, len(self.vectors))
+            score = self.norms[start:stop] - 2 * (self.vectors[start:stop] @ query)
+            if start <= position < stop:
+                score[position - start] = np.inf
+            best = np.argpartition(score, k - 1)[:k] if len(score) > k else np.arange(len(score))
+            candidates.append(best + start)
+            scores.append(score[best])
+        candidates = np.concatenate(candidates)
+        scores = np.concatenate(scores)
+        order = np.argsort(scores, kind='stable')[:k]
+        distances = np.sqrt(np.maximum(scores[order] + query @ query, 0))
+        return candidates[order], distances
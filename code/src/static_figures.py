@@ -0,0 +1,69 @@
+'''
+    Registry of figures that take no user input (Bar and Violin pages).
+
+    Each figure is built and serialized once, on first use or by warm(), and
+    then served from memory on every page navigation. invalidate() drops the
+    built figures when the underlying dataset is reloaded.
+'''
+import threading
+
+import metrics
+from figure_cache import serialize
+
+_builders = {}
+_figures = {}
+_lock = threading.Lock()
+_generation = 0
+
+
+def register(name, build):
+    """
+    Registers a static figure.
+
+    Args:
+        name (str): Figure name.
+        build (callable): Returns the go.Figure; called with no arguments.
+    """
+    with _lock:
+        _builders[name] = build
+        _figures.pop(name, None)
+
+
+def get(name):
+    """
+    Returns the serialized figure, building it on first use.
+
+    Args:
+        name (str): Figure name.
+
+    Returns:
+        dict: The serialized figure.
+    """
+    figure = _figures.get(name)
+    metrics.record_cache_lookup(figure is not None)
+    if figure is None:
+        with _lock:
+            figure = _figures.get(name)
+            if figure is None:
+                generation = _generation
+                with metrics.phase('build'):
+                    fig = _builders[name]()
+                with metrics.phase('serialize'):
+                    figure = serialize(fig)
+                if generation == _generation:
+                    _figures[name] = figure
+    return figure
+
+
+def warm():
+    """Builds every registered figure that has not been built yet."""
+    for name in list(_builders):
+        get(name)
+
+
+def invalidate():
+    """Drops every built figure so the next get() rebuilds it."""
+    global _generation
+    _generation += 1
+    with _lock:
+        _figures.clear()
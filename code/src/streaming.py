@@ -0,0 +1,233 @@
+'''
+    Out-of-core, single-pass aggregation for CSV exports larger than RAM.
+
+    The CSV is read in chunks of CHUNK_ROWS rows, and every chunk updates
+    mergeable accumulators for all derived tables at once:
+
+    - genre/subgenre/year moments (counts, sums, sums of squares), from
+      which the genre means, year x genre counts, year x genre feature
+      means and radar means follow exactly (preprocess.tables_from_moments);
+    - popularity counts per violin bin (preprocess.violin_counts_df);
+    - a uniform sample of SAMPLE_ROWS tracks, the ones with the smallest of
+      a random key per row, for the per-track scatter, violin and filter
+      tables;
+    - the uint64 hashes of the track ids, for ingestion's deduplication.
+
+    Memory is bounded by the chunk, the sample and 8 bytes per distinct
+    track, whatever the size of the file. aggregate_store builds stores
+    this way for CSVs larger than STREAM_THRESHOLD bytes, or always with
+
+        python aggregate_store.py --out-of-core catalog.csv
+'''
+import os
+
+import numpy as np
+import pandas as pd
+
+import dataset
+import preprocess
+from popularity_index import sort_frame
+
+CHUNK_ROWS = int(os.environ.get('DATAVIZ_CHUNK_ROWS', 250000))
+
+SAMPLE_ROWS = int(os.environ.get('DATAVIZ_SAMPLE_ROWS', 250000))
+
+STREAM_THRESHOLD = int(os.environ.get('DATAVIZ_STREAM_THRESHOLD', 1 << 30))
+
+# Columns of the per-track tables (scatter_chart_df, violin_plots_df, tracks_df).
+SAMPLE_COLUMNS = [
+    'track_name', 'track_artist', 'track_popularity', 'playlist_genre', 'playlist_subgenre',
+    'danceability', 'energy', 'key', 'mode', 'speechiness', 'acousticness',
+    'instrumentalness', 'valence', 'tempo', 'duration_ms'
+]
+
+# Every column any accumulator reads; the others are never parsed.
+STREAM_COLUMNS = SAMPLE_COLUMNS + ['track_id', 'track_album_release_date', 'loudness', 'liveness']
+
+
+def read_chunks(csv_path, chunk_rows=CHUNK_ROWS):
+    """
+    Parses the raw CSV chunk by chunk, typed like dataset.read_csv.
+
+    Args:
+        csv_path (str): Path to the CSV.
+        chunk_rows (int): Rows per chunk.
+
+    Yields:
+        pd.DataFrame: STREAM_COLUMNS plus an int16 'release_year' column.
+    """
+    dtypes = {col: dtype for col, dtype in dataset.CSV_DTYPES.items() if col in STREAM_COLUMNS}
+    for chunk in pd.read_csv(csv_path, usecols=STREAM_COLUMNS, dtype=dtypes, chunksize=chunk_rows):
+        chunk['release_year'] = dataset.parse_release_years(chunk['track_album_release_date'])
+        yield chunk
+
+
+class CountAccumulator:
+    """
+    Additive table (counts, sums) built per chunk and merged by key.
+    """
+
+    def __init__(self, build, keys, categorical):
+        self.build = build
+        self.keys = keys
+        self.categorical = categorical
+        self.table = None
+
+    def update(self, chunk):
+        self.merge_table(self.build(chunk))
+
+    def merge_table(self, table):
+        if self.table is None:
+            self.table = table
+        else:
+            self.table = preprocess.merge_counts([self.table, table], self.keys, self.categorical)
+
+    def merge(self, other):
+        if other.table is not None:
+            self.merge_table(other.table)
+
+
+class SampleAccumulator:
+    """
+    Uniform sample without replacement: the rows with the smallest random keys.
+
+    Keeping the k smallest keys is order-independent, so samples of
+    separate chunks merge into a sample of their union.
+    """
+
+    def __init__(self, size=SAMPLE_ROWS, seed=42):
+        self.size = size
+        self.rng = np.random.default_rng(seed)
+        self.rows = None
+        self.keys = np.empty(0)
+        self.seen = 0
+
+    def update(self, chunk):
+        chunk = chunk[SAMPLE_COLUMNS].set_index(np.arange(self.seen, self.seen + len(chunk)))
+        self.seen += len(chunk)
+        keys = self.rng.random(len(chunk))
+        if len(self.keys) >= self.size:
+            below = keys < self.keys.max()
+            chunk, keys = chunk[below], keys[below]
+        self._add(chunk, keys)
+
+    def _add(self, rows, keys):
+        if self.rows is not None:
+            rows = pd.concat([self.rows, rows])
+            keys = np.concatenate([self.keys, keys])
+        if len(keys) > self.size:
+            best = np.argpartition(keys, self.size - 1)[:self.size]
+            rows, keys = rows.take(best), keys[best]
+        self.rows, self.keys = rows, keys
+
+    def merge(self, other):
+        if other.rows is not None:
+            self._add(other.rows, other.keys)
+
+    def sample(self):
+        """Returns the sampled rows in file order, typed like dataset.read_csv."""
+        if self.rows is None:
+            return pd.DataFrame(columns=SAMPLE_COLUMNS)
+        # Chunks carry their own categories, so concatenation may fall back to object.
+        dtypes = {col: dtype for col, dtype in dataset.CSV_DTYPES.items() if col in SAMPLE_COLUMNS}
+        return self.rows.sort_index().reset_index(drop=True).astype(dtypes)
+
+
+class HashAccumulator:
+    """
+    Sorted distinct track id hashes. Chunks are merged in batches that at
+    least double the set, so merging costs O(n log n) overall.
+    """
+
+    def __init__(self):
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self._pending = []
+        self._pending_size = 0
+
+    def update(self, chunk):
+        self._add(np.unique(dataset.track_hashes(chunk['track_id'])))
+
+    def _add(self, hashes):
+        self._pending.append(hashes)
+        self._pending_size += len(hashes)
+        if self._pending_size >= max(len(self.hashes), 1 << 20):
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self.hashes = np.unique(np.concatenate([self.hashes] + self._pending))
+            self._pending, self._pending_size = [], 0
+
+    def merge(self, other):
+        other._flush()
+        self._add(other.hashes)
+
+    def result(self):
+        self._flush()
+        return self.hashes
+
+
+class TableAccumulators:
+    """
+    Every accumulator behind the derived tables, updated in one pass.
+    """
+
+    def __init__(self, sample_rows=SAMPLE_ROWS):
+        self.moments = CountAccumulator(preprocess.hierarchy_df, preprocess.MOMENT_KEYS,
+                                        preprocess.MOMENT_KEYS[:2])
+        self.violin_counts = CountAccumulator(preprocess.violin_counts_df, preprocess.VIOLIN_COUNT_KEYS,
+                                              ['feature', 'bin'])
+        self.sample = SampleAccumulator(sample_rows)
+        self.track_ids = HashAccumulator()
+
+    def update(self, chunk):
+        for accumulator in [self.moments, self.violin_counts, self.sample, self.track_ids]:
+            accumulator.update(chunk)
+
+    def merge(self, other):
+        """Folds in the accumulators of another part of the data."""
+        self.moments.merge(other.moments)
+        self.violin_counts.merge(other.violin_counts)
+        self.sample.merge(other.sample)
+        self.track_ids.merge(other.track_ids)
+
+    def tables(self):
+        """
+        Derives the store tables, as aggregate_store.build_tables.
+
+        The aggregate tables are exact; scatter_df, violin_df and tracks_df
+        hold the sampled tracks, and track_ids holds 'track_hash' values.
+
+        Returns:
+            dict: Table name to dataframe.
+        """
+        moments = self.moments.table
+        tables = preprocess.tables_from_moments(moments)
+        sample = self.sample.sample()
+        tables.update({
+            'hierarchy_df': moments,
+            'scatter_df': sort_frame(preprocess.scatter_chart_df(sample, sample_size=None)),
+            'violin_df': preprocess.violin_plots_df(sample),
+            'violin_counts': self.violin_counts.table,
+            'tracks_df': preprocess.tracks_df(sample),
+            'track_ids': pd.DataFrame({'track_hash': self.track_ids.result()}),
+        })
+        return tables
+
+
+def build_tables(csv_path, chunk_rows=CHUNK_ROWS, sample_rows=SAMPLE_ROWS):
+    """
+    Computes every derived table in one pass over the CSV, with bounded memory.
+
+    Args:
+        csv_path (str): Path to the CSV.
+        chunk_rows (int): Rows parsed at a time.
+        sample_rows (int): Size of the per-track sample.
+
+    Returns:
+        dict: Table name to dataframe, see TableAccumulators.tables.
+    """
+    accumulators = TableAccumulators(sample_rows)
+    for chunk in read_chunks(csv_path, chunk_rows):
+        accumulators.update(chunk)
+    return accumulators.tables()
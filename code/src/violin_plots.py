@@ -1,37 +1,271 @@
+import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
-def get_figure(df):
+FEATURES = [
+    ('danceability_bin', 'Danceability'),
+    ('acousticness_bin', 'Acousticness'),
+    ('instrumentalness_bin', 'Instrumentalness'),
+    ('mode_bin', 'Mode'),
+    ('duration_bin', 'Duration'),
+    ('tempo_bin', 'Tempo')
+]
+
+COLORS = ['#ff7f0e', '#2ca02c', '#9467bd']
+
+# Fixed payload size per violin: points on the density curve and histogram
+# bins used to evaluate it, independent of how many tracks fall in the bin.
+KDE_POINTS = 100
+KDE_BINS = 512
+
+
+def summarize(values):
     """
-    Generates a grid of violin plots for popularity distribution.
+    Computes the statistics a violin needs from raw values, server-side.
+
+    The density is a Gaussian KDE (Silverman bandwidth, as Plotly uses)
+    evaluated from a fixed-size histogram, so its cost and size do not grow
+    with the number of values. Integer values are first reduced to counts
+    per distinct value, see summarize_counts.
+
+    Args:
+        values (np.ndarray): Raw values for one violin.
+
+    Returns:
+        dict: 'grid' and 'density' arrays, plus 'q1', 'median', 'q3',
+        'mean', 'lowerfence', 'upperfence' and 'count'.
     """
-    features = [
-        ('danceability_bin', 'Danceability'),
-        ('acousticness_bin', 'Acousticness'),
-        ('instrumentalness_bin', 'Instrumentalness'),
-        ('mode_bin', 'Mode'),
-        ('duration_bin', 'Duration'),
-        ('tempo_bin', 'Tempo')
-    ]
-    
-    fig = make_subplots(
+    values = np.asarray(values)
+    if values.dtype.kind in 'iu':
+        if len(values) == 0:
+            return None
+        lo = int(values.min())
+        counts = np.bincount(values - lo)
+        return summarize_counts(lo + np.arange(len(counts)), counts)
+    values = values.astype(np.float64)
+    values = values[~np.isnan(values)]
+    n = len(values)
+    if n == 0:
+        return None
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    lo, hi = values.min(), values.max()
+
+    spread = min(values.std(), iqr / 1.349) or values.std() or 1.0
+    bandwidth = 1.059 * spread * n ** -0.2
+
+    counts, edges = np.histogram(values, bins=KDE_BINS, range=(lo, hi if hi > lo else lo + 1))
+    return _summary(values.mean(), q1, median, q3, lo, hi, bandwidth, n, edges, counts,
+                    values[values >= q1 - 1.5 * iqr].min(), values[values <= q3 + 1.5 * iqr].max())
+
+
+def summarize_counts(support, counts):
+    """
+    Computes the same statistics as summarize from counts per distinct value.
+
+    Cost depends on the number of distinct values only, so integer columns
+    such as popularity are summarized in O(range) once counted.
+
+    Args:
+        support (np.ndarray): Increasing distinct values.
+        counts (np.ndarray): Number of occurrences of each value.
+
+    Returns:
+        dict: See summarize; None if counts is all zero.
+    """
+    present = counts > 0
+    support = np.asarray(support, dtype=np.float64)[present]
+    counts = np.asarray(counts)[present]
+    n = int(counts.sum())
+    if n == 0:
+        return None
+    cumulative = np.cumsum(counts)
+
+    def percentile(p):
+        # Linear interpolation between order statistics, as np.percentile.
+        rank = p / 100 * (n - 1)
+        below = int(np.floor(rank))
+        lower = support[np.searchsorted(cumulative, below, side='right')]
+        upper = support[np.searchsorted(cumulative, min(below + 1, n - 1), side='right')]
+        return lower + (rank - below) * (upper - lower)
+
+    q1, median, q3 = percentile(25), percentile(50), percentile(75)
+    iqr = q3 - q1
+    lo, hi = support[0], support[-1]
+    mean = (support * counts).sum() / n
+    std = np.sqrt((counts * (support - mean) ** 2).sum() / n)
+
+    spread = min(std, iqr / 1.349) or std or 1.0
+    bandwidth = 1.059 * spread * n ** -0.2
+
+    histogram, edges = np.histogram(support, bins=KDE_BINS, range=(lo, hi if hi > lo else lo + 1), weights=counts)
+    return _summary(mean, q1, median, q3, lo, hi, bandwidth, n, edges, histogram,
+                    support[support >= q1 - 1.5 * iqr].min(), support[support <= q3 + 1.5 * iqr].max())
+
+
+def _summary(mean, q1, median, q3, lo, hi, bandwidth, n, edges, counts, lowerfence, upperfence):
+    centers = (edges[:-1] + edges[1:]) / 2
+    grid = np.linspace(lo - 2 * bandwidth, hi + 2 * bandwidth, KDE_POINTS)
+    z = (grid[:, None] - centers[None, :]) / bandwidth
+    density = np.exp(-0.5 * z * z) @ counts / (n * bandwidth * np.sqrt(2 * np.pi))
+
+    return {
+        'grid': grid,
+        'density': density,
+        'q1': q1,
+        'median': median,
+        'q3': q3,
+        'mean': mean,
+        'lowerfence': lowerfence,
+        'upperfence': upperfence,
+        'count': n,
+    }
+
+
+def group_by_code(values, codes, n_bins):
+    """
+    Splits values into one array per bin code with a single stable argsort.
+
+    Args:
+        values (np.ndarray): Values to group (e.g. popularity).
+        codes (np.ndarray): Integer bin code per value, -1 for missing.
+        n_bins (int): Number of bins.
+
+    Returns:
+        list: n_bins arrays, the i-th holding the values with code i.
+    """
+    order = np.argsort(codes, kind='stable')
+    counts = np.bincount(codes[codes >= 0], minlength=n_bins)
+    skipped = len(codes) - counts.sum()
+    return np.split(values[order][skipped:], np.cumsum(counts)[:-1])
+
+
+def count_table(offsets, codes, n_bins, width):
+    """
+    Counts values per bin code in one bincount.
+
+    Args:
+        offsets (np.ndarray): Integer values minus their minimum.
+        codes (np.ndarray): Integer bin code per value, -1 for missing.
+        n_bins (int): Number of bins.
+        width (int): Number of distinct offsets (max offset + 1).
+
+    Returns:
+        np.ndarray: Counts of shape (n_bins, width).
+    """
+    valid = codes >= 0
+    flat = codes[valid].astype(np.int64) * width + offsets[valid]
+    return np.bincount(flat, minlength=n_bins * width).reshape(n_bins, width)
+
+
+def _summary_traces(summary, position, name, color):
+    """Draws one precomputed violin as a filled outline plus a box."""
+    half_width = summary['density'] / summary['density'].max() * 0.4
+    outline = go.Scatter(
+        x=np.concatenate([position - half_width, (position + half_width)[::-1]]),
+        y=np.concatenate([summary['grid'], summary['grid'][::-1]]),
+        fill='toself',
+        mode='lines',
+        name=name,
+        line=dict(color=color, width=1.5),
+        hoverinfo='skip',
+        showlegend=False
+    )
+    box = go.Box(
+        x=[position],
+        q1=[summary['q1']],
+        median=[summary['median']],
+        q3=[summary['q3']],
+        mean=[summary['mean']],
+        lowerfence=[summary['lowerfence']],
+        upperfence=[summary['upperfence']],
+        boxmean=True,
+        width=0.12,
+        name=name,
+        line_color=color,
+        fillcolor='white',
+        showlegend=False
+    )
+    return [outline, box]
+
+
+def _grid():
+    """Creates the 2 x 3 subplot grid, one cell per feature."""
+    return make_subplots(
         rows=2, cols=3,
-        subplot_titles=[feat[1] for feat in features],
+        subplot_titles=[feat[1] for feat in FEATURES],
         vertical_spacing=0.12,
         horizontal_spacing=0.1
     )
+
+
+def _add_summaries(fig, i, categories, summaries):
+    """Draws the precomputed violins of the i-th feature's bins."""
+    row = i // 3 + 1
+    col = i % 3 + 1
+    for j, (category, summary) in enumerate(zip(categories, summaries)):
+        for trace in _summary_traces(summary, j, str(category), COLORS[j % len(COLORS)]):
+            fig.add_trace(trace, row=row, col=col)
+    fig.update_xaxes(
+        tickvals=list(range(len(categories))),
+        ticktext=[str(category) for category in categories],
+        row=row, col=col
+    )
+
+
+def _finish(fig):
+    fig.update_layout(
+        title='Popularity Distribution Across Audio Feature Categories',
+        font=dict(family="Segoe UI", size=12, color="#333"),
+        height=800,
+        plot_bgcolor="#f0f2f5",
+        paper_bgcolor="white"
+    )
+    return fig
+
+
+def get_figure(df, mode='raw'):
+    """
+    Generates a grid of violin plots for popularity distribution.
+
+    mode='raw' sends every popularity value and lets the browser estimate
+    densities. mode='summary' computes densities and box statistics on the
+    server (see summarize), keeping the payload size constant.
+    """
+    features = FEATURES
     
+    fig = _grid()
 
-    colors= ['#ff7f0e', '#2ca02c', '#9467bd']
-    for i, (feature_col, feature_name) in enumerate(features):
+    colors = COLORS
+    popularity = df['track_popularity'].to_numpy()
+    # Integer popularity is summarized from a bins x values count table,
+    # which needs no sort or per-bin copy of the values.
+    counted = mode == 'summary' and popularity.dtype.kind in 'iu' and len(popularity) > 0
+    if counted:
+        lo = int(popularity.min())
+        support = lo + np.arange(int(popularity.max()) - lo + 1)
+        offsets = popularity.astype(np.int64) - lo
+    for i, (feature_col, _) in enumerate(features):
         row = i // 3 + 1
         col = i % 3 + 1
         
-        categories = df[feature_col].dropna().unique()
+        bins = df[feature_col].cat
+        codes = bins.codes.to_numpy()
+        if counted:
+            table = count_table(offsets, codes, len(bins.categories), len(support))
+            summaries = [summarize_counts(support, counts) for counts in table]
+        elif mode == 'summary':
+            summaries = [summarize(data) for data in group_by_code(popularity, codes, len(bins.categories))]
+        if mode == 'summary':
+            categories = [category for category, summary in zip(bins.categories, summaries) if summary is not None]
+            _add_summaries(fig, i, categories, [summary for summary in summaries if summary is not None])
+            continue
+
+        groups = group_by_code(popularity, codes, len(bins.categories))
+        categories = [category for category, data in zip(bins.categories, groups) if len(data)]
+        groups = [data for data in groups if len(data)]
         
-        for j, category in enumerate(categories):
-            data = df[df[feature_col] == category]['track_popularity']
-            
+        for j, (category, data) in enumerate(zip(categories, groups)):
             fig.add_trace(
                 go.Violin(
                     y=data,
@@ -44,12 +278,36 @@ def get_figure(df):
                 row=row, col=col
             )
     
-    fig.update_layout(
-        title='Popularity Distribution Across Audio Feature Categories',
-        font=dict(family="Segoe UI", size=12, color="#333"),
-        height=800,
-        plot_bgcolor="#f0f2f5",
-        paper_bgcolor="white"
-    )
-    
-    return fig
+    return _finish(fig)
+
+
+def get_counts_figure(counts_df):
+    """
+    Generates the summary-mode grid from popularity counts per bin, so no
+    per-track rows are needed.
+
+    Args:
+        counts_df (pd.DataFrame): 'feature', 'bin_index', 'bin',
+            'track_popularity' and 'count' columns, as
+            preprocess.violin_counts_df.
+    """
+    fig = _grid()
+    feature = counts_df['feature'].astype(str).to_numpy()
+    bin_index = counts_df['bin_index'].to_numpy().astype(np.int64)
+    labels = counts_df['bin'].astype(str).to_numpy()
+    popularity = counts_df['track_popularity'].to_numpy().astype(np.int64)
+    counts = counts_df['count'].to_numpy()
+    lo = int(popularity.min()) if len(popularity) else 0
+    support = lo + np.arange(int(popularity.max()) - lo + 1 if len(popularity) else 1)
+
+    for i, (feature_col, _) in enumerate(FEATURES):
+        rows = feature == feature_col
+        n_bins = int(bin_index[rows].max()) + 1 if rows.any() else 0
+        table = np.zeros((n_bins, len(support)), dtype=np.int64)
+        np.add.at(table, (bin_index[rows], popularity[rows] - lo), counts[rows])
+        names = dict(zip(bin_index[rows], labels[rows]))
+        summaries = [summarize_counts(support, row_counts) for row_counts in table]
+        categories = [names[j] for j, summary in enumerate(summaries) if summary is not None]
+        _add_summaries(fig, i, categories, [summary for summary in summaries if summary is not None])
+
+    return _finish(fig)
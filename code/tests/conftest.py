@@ -0,0 +1,26 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The app's modules are flat in code/src and import each other by name.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import benchmark  # noqa: E402
+
+
+@pytest.fixture
+def raw_csv(tmp_path):
+    """Writes a synthetic spotify_songs.csv with audio features on the violin bin edges."""
+    def write(n_rows=2000, seed=0, name='spotify_songs.csv'):
+        df = benchmark.generate(n_rows, seed).drop(columns=['release_year'])
+        edges = {'danceability': [0.33, 0.66, 1.0], 'acousticness': [0.5, 1.0],
+                 'instrumentalness': [0.5, 1.0], 'tempo': [90.0, 120.0]}
+        for column, values in edges.items():
+            df[column] = df[column].astype('float64').round(3)
+            df.loc[df.index[:len(values) * 10], column] = np.repeat(values, 10)
+        path = tmp_path / name
+        df.to_csv(path, index=False)
+        return str(path)
+    return write
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import preprocess
+
+
+def _boundary_values(edges):
+    finite = [edge for edge in edges if np.isfinite(edge)]
+    # The CSV's 3-decimal resolution for [0, 1] features, whole units otherwise.
+    delta = 0.001 if max(finite) <= 1 else 1
+    values = [edge + step for edge in finite for step in (-delta, 0, delta)]
+    return np.array(values + [np.nan], dtype=np.float64)
+
+
+@pytest.mark.parametrize('bin_col', list(preprocess.VIOLIN_BINS))
+@pytest.mark.parametrize('dtype', ['float32', 'float64'])
+def test_bin_codes_match_pd_cut_on_edges(bin_col, dtype):
+    _, edges, labels = preprocess.VIOLIN_BINS[bin_col]
+    # 3-decimal values as parsed from the CSV; pd.cut on float64 is the reference.
+    values = np.round(_boundary_values(edges), 3)
+    expected = pd.cut(values, bins=edges, labels=labels, right=True).codes
+    codes = preprocess.bin_codes(values.astype(dtype), edges)
+    np.testing.assert_array_equal(codes, expected)
+
+
+def test_bin_codes_on_integer_values():
+    edges = preprocess.VIOLIN_BINS['duration_bin'][1]
+    values = np.array([0, 1, 180000, 180001, 240000, 240001], dtype=np.int32)
+    expected = pd.cut(values, bins=edges, right=True).codes
+    np.testing.assert_array_equal(preprocess.bin_codes(values, edges), expected)
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import aggregate_store
+import dataset
+import ingest
+import streaming
+
+
+def _normalized(df):
+    df = df.reset_index(drop=True)
+    df = df.assign(**{
+        name: df[name].astype(str) for name in df.columns
+        if isinstance(df[name].dtype, pd.CategoricalDtype) or df[name].dtype == object
+    })
+    floats = [name for name in df.columns if df[name].dtype.kind == 'f']
+    keys = [name for name in df.columns if name not in floats] + floats
+    return df.sort_values(keys, kind='stable').reset_index(drop=True)
+
+
+def assert_tables_equal(actual, expected):
+    for name in expected:
+        if name == 'track_ids':
+            continue
+        pd.testing.assert_frame_equal(_normalized(actual[name]), _normalized(expected[name]),
+                                      check_dtype=False, rtol=1e-5, obj=name)
+
+
+def test_streaming_matches_in_memory_build(raw_csv):
+    path = raw_csv(3000)
+    expected = aggregate_store.build_tables(dataset.read_csv(path))
+    # A sample larger than the file keeps every track, so all tables are exact.
+    actual = streaming.build_tables(path, chunk_rows=700, sample_rows=10 ** 6)
+    assert_tables_equal(actual, expected)
+    raw_ids = dataset.read_csv(path)['track_id']
+    np.testing.assert_array_equal(actual['track_ids']['track_hash'].to_numpy(),
+                                  np.unique(dataset.track_hashes(raw_ids)))
+
+
+@pytest.mark.parametrize('hashed', [False, True])
+def test_ingest_matches_full_recompute(raw_csv, hashed):
+    raw = dataset.read_csv(raw_csv(3000))
+    base, new = raw.iloc[:2000], raw.iloc[2000:]
+    # The delta repeats 100 known tracks, which must be dropped.
+    delta = pd.concat([raw.iloc[:100], new]).reset_index(drop=True)
+    tables = aggregate_store.build_tables(base.reset_index(drop=True))
+    if hashed:
+        tables['track_ids'] = pd.DataFrame({'track_hash': np.unique(dataset.track_hashes(base['track_id']))})
+
+    merged, accepted = ingest.merge_tables(tables, delta)
+
+    assert accepted == len(new)
+    assert_tables_equal(merged, aggregate_store.build_tables(raw))
+    assert len(merged['track_ids']) == len(raw)
+
+
+def test_ingest_keeps_same_named_deltas_apart(raw_csv, tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, 'DELTA_DIR', str(tmp_path / 'deltas'))
+    csv_path = raw_csv(1000)
+    cache_dir = str(tmp_path / 'cache')
+    first = pd.read_csv(raw_csv(200, seed=1, name='a.csv'))
+    second = pd.read_csv(raw_csv(300, seed=2, name='b.csv'))
+    first['track_id'] = 'first' + first['track_id']
+    second['track_id'] = 'second' + second['track_id']
+    delta_path = tmp_path / 'delta.csv'
+    accepted = []
+    for delta in [first, second, second]:
+        delta.to_csv(delta_path, index=False)
+        accepted.append(ingest.ingest(str(delta_path), csv_path, cache_dir))
+
+    assert accepted == [200, 300, 0]
+    assert len(list((tmp_path / 'deltas').iterdir())) == 3
+
+
+def test_ingest_rejects_malformed_delta(raw_csv, tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, 'DELTA_DIR', str(tmp_path / 'deltas'))
+    delta_path = tmp_path / 'delta.csv'
+    delta_path.write_text('foo,bar\n1,2\n')
+    with pytest.raises(ValueError):
+        ingest.ingest(str(delta_path), raw_csv(100), str(tmp_path / 'cache'))
+    assert not (tmp_path / 'deltas').exists() or not list((tmp_path / 'deltas').iterdir())
@@ -0,0 +1,14 @@
+import numpy as np
+import pandas as pd
+
+import dataset
+import preprocess
+
+
+def test_float32_features_keep_edge_values_in_their_bin(raw_csv):
+    path = raw_csv()
+    reference = pd.read_csv(path)
+    binned = preprocess.violin_plots_df(dataset.read_csv(path))
+    for bin_col, (source_col, edges, labels) in preprocess.VIOLIN_BINS.items():
+        expected = pd.cut(reference[source_col], bins=edges, labels=labels, right=True)
+        np.testing.assert_array_equal(binned[bin_col].cat.codes, expected.cat.codes, err_msg=bin_col)
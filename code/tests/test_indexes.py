@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import dataset
+import preprocess
+from bitmap_index import BitmapIndex
+from cross_filter import CrossFilter, polygon_grid
+from popularity_index import PopularityIndex, sort_frame
+
+
+@pytest.fixture
+def raw(raw_csv):
+    return dataset.read_csv(raw_csv(3000))
+
+
+def test_popularity_index_query_matches_mask(raw):
+    scatter = sort_frame(preprocess.scatter_chart_df(raw, sample_size=None))
+    index = PopularityIndex(scatter)
+    for genres, low, high in [(['pop', 'rap'], 20, 80), (['rock'], 0, 100), (['edm', 'nope'], 55, 55),
+                              (['latin'], 90, 10), ([], 0, 100)]:
+        expected = scatter[scatter['playlist_genre'].isin(genres)
+                           & scatter['track_popularity'].between(low, high)]
+        result = index.query(genres, low, high)
+        assert sorted(result.index) == sorted(expected.index)
+
+
+def test_popularity_index_rejects_unsorted_frame(raw):
+    scatter = preprocess.scatter_chart_df(raw, sample_size=None)
+    with pytest.raises(ValueError):
+        PopularityIndex(scatter.sort_values('track_popularity', ascending=False))
+
+
+def test_bitmap_index_between_and_select_match_masks(raw):
+    tracks = preprocess.tracks_df(raw)
+    index = BitmapIndex(tracks)
+    popularity = tracks['track_popularity']
+    for low, high in [(20, 80), (-5, 3), (0, 0), (97, 200), (60, 40), (popularity.min(), popularity.max())]:
+        expected = popularity.between(low, high).to_numpy()
+        np.testing.assert_array_equal(index.mask(index.between(low, high)), expected)
+        assert index.count(index.between(low, high)) == expected.sum()
+
+    filters = {'playlist_genre': ['pop', 'rock'], 'mode': [1], 'danceability_bin': ['High']}
+    expected = (tracks['playlist_genre'].isin(['pop', 'rock']) & (tracks['mode'] == 1)
+                & (tracks['danceability_bin'] == 'High') & popularity.between(30, 70)).to_numpy()
+    np.testing.assert_array_equal(index.mask(index.select(filters, (30, 70))), expected)
+
+
+def _inside(xs, ys, px, py):
+    # Even-odd ray casting, one point at a time.
+    inside = False
+    for i in range(len(xs)):
+        x0, y0, x1, y1 = xs[i], ys[i], xs[i - 1], ys[i - 1]
+        if (y0 <= py) != (y1 <= py) and px < x0 + (py - y0) / (y1 - y0) * (x1 - x0):
+            inside = not inside
+    return inside
+
+
+def test_polygon_grid_matches_point_in_polygon():
+    rng = np.random.default_rng(3)
+    angles = np.sort(rng.uniform(0, 2 * np.pi, 12))
+    radii = rng.uniform(0.1, 0.45, 12)  # A non-convex star.
+    xs, ys = 0.5 + radii * np.cos(angles), 0.5 + radii * np.sin(angles)
+    size = 64
+    grid = polygon_grid(xs, ys, size)
+    centers = (np.arange(size) + 0.5) / size
+    expected = np.array([[_inside(xs, ys, cx, cy) for cx in centers] for cy in centers])
+    np.testing.assert_array_equal(grid, expected)
+
+
+def test_cross_filter_box_region_is_exact(raw):
+    tracks = preprocess.tracks_df(raw)
+    cross = CrossFilter(tracks, BitmapIndex(tracks))
+    region = {'range': {'x': [0.7, 0.3], 'y': [0.2, 0.6]}}
+    expected = (tracks['energy'].between(0.3, 0.7) & tracks['valence'].between(0.2, 0.6)).to_numpy()
+    np.testing.assert_array_equal(cross.region_mask(region), expected)
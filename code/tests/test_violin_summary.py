@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+import violin_plots
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_summarize_counts_matches_raw_values(seed):
+    rng = np.random.default_rng(seed)
+    values = np.clip(rng.normal(45, 22, 5001), 0, 100).astype(np.int64)
+    values[:40] = 100  # Outliers past the upper fence.
+    raw = violin_plots.summarize(values.astype(np.float64))
+    lo = values.min()
+    counted = violin_plots.summarize_counts(lo + np.arange(values.max() - lo + 1), np.bincount(values - lo))
+
+    for key in ['q1', 'median', 'q3', 'mean', 'lowerfence', 'upperfence', 'count']:
+        assert counted[key] == pytest.approx(raw[key]), key
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    assert (counted['q1'], counted['median'], counted['q3']) == pytest.approx((q1, median, q3))
+    iqr = q3 - q1
+    assert counted['upperfence'] == values[values <= q3 + 1.5 * iqr].max()
+    assert counted['lowerfence'] == values[values >= q1 - 1.5 * iqr].min()
+    np.testing.assert_allclose(counted['density'], raw['density'], rtol=1e-9, atol=1e-12)
+
+
+def test_summarize_counts_of_nothing_is_none():
+    assert violin_plots.summarize_counts(np.arange(3), np.zeros(3, dtype=np.int64)) is None